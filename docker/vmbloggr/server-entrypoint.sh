@@ -19,6 +19,19 @@ python manage.py migrate
 
 cat create_superuser.py | python manage.py shell
 
-gunicorn vmbloggr.wsgi --bind 0.0.0.0:8000  --workers 4 --threads 4
+# the workers share their Prometheus metrics through files here (see gunicorn.conf.py)
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/vmbloggr-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+if [ "$SERVER_MODE" = "asgi" ]
+then
+    # one event loop per worker; connections are not reused across async requests
+    export DB_CONN_MAX_AGE=0
+    export BLOG_ASYNC_READS=True
+    gunicorn vmbloggr.asgi:application --bind 0.0.0.0:8000  --workers 4 -k uvicorn.workers.UvicornWorker
+else
+    gunicorn vmbloggr.wsgi --bind 0.0.0.0:8000  --workers 4 --threads 4
+fi
 
 # --log-config log.conf  ## goes after --bind 0.0.0.0:8000 and before --access-logfile '-' --error-logfile '-'
\ No newline at end of file
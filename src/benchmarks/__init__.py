@@ -0,0 +1,50 @@
+''' Local benchmarks for vmbloggr.
+
+Run them from the src directory, e.g. ``python -m benchmarks.login``. Each
+benchmark runs against a throwaway test database created from the configured
+``DJANGO_DB`` backend (SQLite by default), never against real data.
+'''
+import os
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vmbloggr.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-only-secret-key')
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0):
+    ''' Create the test database for the default alias, and drop it afterwards.'''
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def percentile(timings, fraction):
+    ''' The value below which `fraction` of timings fall, e.g. 0.95 for the 95th percentile.'''
+    return sorted(timings)[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+class QueryCounter:
+    ''' connection.execute_wrapper() hook counting statements, and writes among them.'''
+
+    def __init__(self):
+        self.queries = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if sql.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.writes += 1
+        return execute(sql, params, many, context)
@@ -0,0 +1,197 @@
+''' Blog read throughput and latency of the WSGI and ASGI deployments under concurrent readers.
+
+    python -m benchmarks.concurrency [--readers 100,500,1000] [--duration SECONDS] [--workers N]
+
+Starts gunicorn twice on a throwaway test database, configured like
+docker/vmbloggr/server-entrypoint.sh: threaded sync workers, then uvicorn
+workers with the async blog read views (SERVER_MODE=asgi). Each reader is a
+keep-alive connection requesting post details and list pages in a loop for
+--duration seconds. The blog response cache is off unless --cache is given
+with a shared CACHE_BACKEND, so every request reaches the database. On SQLite the test database is a
+temporary file; run it with DJANGO_DB=postgresql against a throwaway server
+for realistic numbers.
+'''
+import argparse
+import asyncio
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import percentile, setup, test_database
+
+MODES = {
+    'sync': ('sync (gthread workers)', {'BLOG_ASYNC_READS': 'False'}),
+    # no persistent connections across async requests, as in the entrypoint
+    'asgi': ('async (uvicorn workers)', {'BLOG_ASYNC_READS': 'True', 'DB_CONN_MAX_AGE': '0'}),
+}
+
+
+def serve(args):
+    ''' Run gunicorn in this process on the test database named by --database.'''
+    from gunicorn.app.base import BaseApplication
+
+    setup()
+    from django.conf import settings
+    # the workers are forked from here, so they inherit the test database
+    settings.DATABASES['default']['NAME'] = args.database
+    settings.ALLOWED_HOSTS = ['127.0.0.1']
+
+    options = {'bind': f'127.0.0.1:{args.port}', 'workers': args.workers, 'loglevel': 'warning', 'backlog': 2048}
+    if args.serve == 'asgi':
+        options['worker_class'] = 'uvicorn.workers.UvicornWorker'
+        target = 'vmbloggr.asgi:application'
+    else:
+        options.update(worker_class='gthread', threads=args.threads)
+        target = 'vmbloggr.wsgi:application'
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            module, name = target.split(':')
+            return getattr(__import__(module, fromlist=[name]), name)
+
+    Server().run()
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(status_line.split()[1])
+
+
+async def run_reader(port, requests, deadline, timings, errors):
+    connection = None
+    while time.monotonic() < deadline:
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection('127.0.0.1', port)
+            reader, writer = connection
+            start = time.monotonic()
+            writer.write(random.choice(requests))
+            status = await read_response(reader)
+            timings.append(time.monotonic() - start)
+            if status != 200:
+                errors.append(status)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError) as error:
+            errors.append(type(error).__name__)
+            if connection is not None:
+                connection[1].close()
+            connection = None
+            await asyncio.sleep(0.05)
+    if connection is not None:
+        connection[1].close()
+
+
+async def load(port, requests, readers, duration):
+    timings, errors = [], []
+    start = time.monotonic()
+    await asyncio.gather(*(run_reader(port, requests, start + duration, timings, errors) for _ in range(readers)))
+    return timings, errors, time.monotonic() - start
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', default='100,500,1000', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='threads per sync worker')
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--cache', action='store_true', help='turn the blog response cache on (needs CACHE_BACKEND)')
+    parser.add_argument('--serve', choices=['sync', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args)
+
+    # a socket per reader, on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    setup()
+    from django.db import connection, connections
+    from blog.models import BlogPost
+    from users.models import User
+
+    tmpdir = tempfile.TemporaryDirectory()
+    if connection.vendor == 'sqlite':
+        # the servers need a database file, not the in-memory default
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir.name, 'benchmark.sqlite3')
+
+    with tmpdir, test_database():
+        user = User.objects.create_user(username='benchuser', password='benchpassword', email='bench@example.com')
+        BlogPost.objects.bulk_create(
+            BlogPost(author=user, title=f'Title {i}', subtitle=f'Subtitle {i}', body='Body ' * 200)
+            for i in range(args.posts)
+        )
+        post_ids = list(BlogPost.objects.values_list('pk', flat=True))
+        database = connection.settings_dict['NAME']
+        connections.close_all()
+
+        headers = f'Host: 127.0.0.1\r\nAuthorization: Bearer {user.tokens()["access"]}\r\nAccept: application/json\r\n\r\n'
+        paths = [f'/api/blogs/{pk}/' for pk in post_ids] + [f'/api/blogs/?page={page}' for page in range(1, 6)]
+        requests = [f'GET {path} HTTP/1.1\r\n{headers}'.encode() for path in paths]
+        levels = [int(level) for level in args.readers.split(',')]
+
+        print(f'database:  {connection.vendor}')
+        print(f'workers:   {args.workers} (sync: {args.threads} threads each), {args.duration:g}s per level')
+        for serve_mode, (label, env) in MODES.items():
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.concurrency', '--serve', serve_mode, '--database', database,
+                 '--port', str(port), '--workers', str(args.workers), '--threads', str(args.threads)],
+                env={**os.environ, **env, 'BLOG_CACHE_ENABLED': str(args.cache)},
+            )
+            try:
+                wait_for_port(port)
+                print(f'\n{label}')
+                print(f'  {"readers":>8} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"errors":>8}')
+                for readers in levels:
+                    timings, errors, elapsed = asyncio.run(load(port, requests, readers, args.duration))
+                    timings = [timing * 1000 for timing in timings] or [0]
+                    print(f'  {readers:>8} {len(timings) / elapsed:>9.1f} {statistics.median(timings):>9.1f} '
+                          f'{percentile(timings, 0.95):>9.1f} {len(errors):>8}')
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main()
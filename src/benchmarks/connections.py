@@ -0,0 +1,96 @@
+''' Request latency with a new database connection per request vs. reused connections.
+
+    python -m benchmarks.connections [--requests N] [--threads N] [--max-age SECONDS]
+
+Requests go through Django's WSGI handler, so connections are opened and
+closed as under gunicorn (on request_started/request_finished), from
+--threads threads like a gunicorn worker's. Run it with DJANGO_DB=postgresql
+against a throwaway server to measure real connection setup; on SQLite the
+test database is a temporary file and connecting is cheap, so the gap shown
+there is a lower bound.
+'''
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from . import percentile, setup, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--max-age', type=int, default=60, help='CONN_MAX_AGE of the persistent run')
+    args = parser.parse_args()
+
+    setup()
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connection, connections
+    from django.db.backends.signals import connection_created
+    from django.test.utils import override_settings
+    from blog.models import BlogPost
+    from users.models import User
+
+    opened = []
+    lock = threading.Lock()
+
+    def count_connection(sender, connection, **kwargs):
+        with lock:
+            opened.append(connection.alias)
+
+    handler = WSGIHandler()
+
+    def worker(environ, count):
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = handler(dict(environ), lambda status, headers: None)
+            b''.join(response)
+            # fires request_finished, which closes or keeps the connection
+            response.close()
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        connections.close_all()
+        return timings
+
+    tmpdir = tempfile.TemporaryDirectory()
+    if connection.vendor == 'sqlite':
+        # an in-memory test database is never closed, which would hide the cost
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir.name, 'benchmark.sqlite3')
+
+    with tmpdir, test_database(), override_settings(BLOG_CACHE_ENABLED=False):
+        user = User.objects.create_user(username='benchuser', password='benchpassword', email='bench@example.com')
+        post = BlogPost.objects.create(author=user, title='Title', subtitle='Subtitle', body='Body')
+        environ = {
+            'PATH_INFO': f'/api/blogs/{post.pk}/',
+            'HTTP_HOST': 'testserver',
+            'SERVER_NAME': 'testserver',
+            'HTTP_AUTHORIZATION': f'Bearer {user.tokens()["access"]}',
+        }
+        setup_testing_defaults(environ)
+        connections.close_all()
+        connection_created.connect(count_connection)
+
+        print(f'database:  {connection.vendor}')
+        print(f'requests:  {args.requests} over {args.threads} threads')
+        for label, max_age in (('new connection per request', 0), (f'persistent (CONN_MAX_AGE={args.max_age})', args.max_age)):
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+            opened.clear()
+            with ThreadPoolExecutor(args.threads) as pool:
+                runs = [pool.submit(worker, environ, args.requests // args.threads) for _ in range(args.threads)]
+                timings = [timing * 1000 for run in runs for timing in run.result()]
+            print(f'\n{label}')
+            print(f'  connections opened:  {len(opened)}')
+            print(f'  mean latency:        {statistics.mean(timings):.2f} ms')
+            print(f'  p50 latency:         {percentile(timings, 0.50):.2f} ms')
+            print(f'  p95 latency:         {percentile(timings, 0.95):.2f} ms')
+        connection_created.disconnect(count_connection)
+
+
+if __name__ == '__main__':
+    main()
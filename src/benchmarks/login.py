@@ -0,0 +1,49 @@
+''' Cost of a single login: database statements, writes and token signatures.
+
+    python -m benchmarks.login [--logins N]
+'''
+import argparse
+import time
+from unittest import mock
+
+from . import QueryCounter, setup, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    import jwt
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+    from users.models import User
+
+    with test_database():
+        User.objects.create_user(username='benchuser', password='benchpassword', email='bench@example.com')
+        client = APIClient()
+        url = reverse('login')
+        counter = QueryCounter()
+        timings = []
+
+        with mock.patch('rest_framework_simplejwt.backends.jwt.encode', wraps=jwt.encode) as encode, \
+                connection.execute_wrapper(counter):
+            for _ in range(args.logins):
+                start = time.perf_counter()
+                response = client.post(url, {'username': 'benchuser', 'password': 'benchpassword'}, format='json')
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.data
+
+        print(f'logins:                    {args.logins}')
+        print(f'queries per login:         {counter.queries / args.logins:.2f}')
+        print(f'db writes per login:       {counter.writes / args.logins:.2f}')
+        print(f'outstanding tokens/login:  {OutstandingToken.objects.count() / args.logins:.2f}')
+        print(f'token signatures/login:    {encode.call_count / args.logins:.2f}')
+        print(f'mean latency:              {sum(timings) / len(timings) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+''' Latency, throughput and queries per request of the main API endpoints.
+
+    python -m benchmarks.suite [--users N] [--posts N] [--requests N] [--cache] [--output FILE] [--compare FILE]
+
+Seeds a throwaway test database with --users users and --posts posts
+(bulk inserts sharing one password hash), then sends --requests requests
+per scenario through Django's test client, i.e. the real URLconf and
+middleware: login, token refresh, post list, post detail, post create and
+post update. Requests are sent one at a time and the random choices are
+seeded, so two runs on the same machine and commit issue the same requests;
+see benchmarks.concurrency for concurrent load. The blog response cache is
+as configured, i.e. off unless CACHE_BACKEND is shared; --cache turns it on.
+
+Results are printed and, with --output, written as JSON to diff between
+commits; --compare prints the change against an earlier results file. Runs
+on SQLite by default; set DJANGO_DB=postgresql to run against a throwaway
+Postgres server.
+'''
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from . import QueryCounter, percentile, setup, test_database
+
+PASSWORD = 'benchpassword'
+BATCH_SIZE = 1000
+
+
+def seed(users, posts):
+    ''' Insert the benchmark users and posts; returns the users.'''
+    from django.contrib.auth.hashers import make_password
+    from blog.models import BlogPost
+    from users.models import User
+
+    # hashing is the slow part of creating users, and every user may share one hash
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        (User(username=f'bench{i}', email=f'bench{i}@example.com', phone_number=f'+1{i:09d}', password=password)
+         for i in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    authors = list(User.objects.order_by('pk'))
+    BlogPost.objects.bulk_create(
+        (BlogPost(author=authors[i % len(authors)], title=f'Title {i}', subtitle=f'Subtitle {i}', body='Body ' * 100)
+         for i in range(posts)),
+        batch_size=BATCH_SIZE,
+    )
+    return authors
+
+
+def scenarios(users, rng):
+    ''' name -> callable(client) making one request and returning the expected status with the response.'''
+    from django.urls import reverse
+    from blog.models import BlogPost
+
+    user = users[0]
+    refresh_tokens = [u.tokens()['refresh'] for u in rng.sample(users, min(len(users), 20))]
+    post_ids = list(BlogPost.objects.values_list('pk', flat=True))
+    own_post_ids = list(BlogPost.objects.filter(author=user).values_list('pk', flat=True))
+    pages = max(1, min(10, len(post_ids) // 10))
+
+    def login(client):
+        username = rng.choice(users).username
+        return 200, client.post(reverse('login'), {'username': username, 'password': PASSWORD}, format='json')
+
+    def refresh(client):
+        return 200, client.post(reverse('token_refresh'), {'refresh': rng.choice(refresh_tokens)}, format='json')
+
+    def post_list(client):
+        return 200, client.get(reverse('blog-posts-list'), {'page': rng.randint(1, pages)})
+
+    def post_detail(client):
+        return 200, client.get(reverse('blog-post-detail', args=[rng.choice(post_ids)]))
+
+    def post_create(client):
+        data = {'title': 'New title', 'subtitle': 'New subtitle', 'body': 'New body'}
+        return 201, client.post(reverse('blog-post-create'), data, format='json')
+
+    def post_update(client):
+        pk = rng.choice(own_post_ids)
+        return 200, client.patch(reverse('blog-post-detail', args=[pk]), {'title': f'Updated {pk}'}, format='json')
+
+    return {
+        'login': login,
+        'token_refresh': refresh,
+        'post_list': post_list,
+        'post_detail': post_detail,
+        'post_create': post_create,
+        'post_update': post_update,
+    }
+
+
+def run(scenario, client, requests, warmup):
+    from django.db import connections
+
+    for _ in range(warmup):
+        scenario(client)
+    counter = QueryCounter()
+    timings = []
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        started = time.perf_counter()
+        for _ in range(requests):
+            start = time.perf_counter()
+            expected, response = scenario(client)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == expected, (response.status_code, getattr(response, 'data', None))
+        elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'requests_per_second': round(requests / elapsed, 1),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'queries_per_request': round(counter.queries / requests, 2),
+        'writes_per_request': round(counter.writes / requests, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    ''' Print the relative change of each metric against an earlier results file.'''
+    print(f'\nchange against {baseline["meta"]["commit"] or "baseline"}')
+    for name, metrics in results['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        changes = []
+        for metric in ('requests_per_second', 'p50_ms', 'p95_ms', 'queries_per_request'):
+            if before[metric]:
+                changes.append(f'{metric} {(metrics[metric] - before[metric]) / before[metric]:+.1%}')
+            else:
+                changes.append(f'{metric} {before[metric]} -> {metrics[metric]}')
+        print(f'  {name:<14} ' + ', '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per scenario')
+    parser.add_argument('--scenarios', help='comma-separated subset of the scenarios to run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--cache', action='store_true',
+        help='turn the blog response cache on; by default it is as configured, i.e. off without a shared CACHE_BACKEND',
+    )
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    setup()
+    import django
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+
+    rng = random.Random(args.seed)
+    with test_database(), override_settings(BLOG_CACHE_ENABLED=args.cache or settings.BLOG_CACHE_ENABLED):
+        cache.clear()
+        started = time.perf_counter()
+        users = seed(args.users, args.posts)
+        seconds = time.perf_counter() - started
+        print(f'database:  {connection.vendor}, seeded {args.users} users and {args.posts} posts in {seconds:.1f}s')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {users[0].tokens()["access"]}')
+        available = scenarios(users, rng)
+        names = args.scenarios.split(',') if args.scenarios else list(available)
+        unknown = set(names) - set(available)
+        if unknown:
+            parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'users': args.users,
+                'posts': args.posts,
+                'requests': args.requests,
+                'seed': args.seed,
+                'blog_cache': settings.BLOG_CACHE_ENABLED,
+            },
+            'scenarios': {},
+        }
+        print(f'\n  {"scenario":<14} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}')
+        for name in names:
+            metrics = results['scenarios'][name] = run(available[name], client, args.requests, args.warmup)
+            print(f'  {name:<14} {metrics["requests_per_second"]:>8} {metrics["p50_ms"]:>8} {metrics["p95_ms"]:>8} '
+                  f'{metrics["p99_ms"]:>8} {metrics["queries_per_request"]:>8}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print(f'\nresults written to {args.output}')
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,4 +7,8 @@ class BlogPostAdmin(admin.ModelAdmin):
     search_fields = ['title', 'subtitle', 'body']
     list_filter = ['author', 'date_created', 'is_deleted']
     date_hierarchy = 'date_created'
-    readonly_fields = ['date_created']
+    readonly_fields = ['date_created', 'date_modified']
+
+    def get_queryset(self, request):
+        # the default manager hides soft-deleted posts
+        return BlogPost.all_objects.all()
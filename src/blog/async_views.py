@@ -0,0 +1,158 @@
+''' Async read paths for the blog list and detail endpoints, for the ASGI mode.
+
+Under an ASGI server a sync view occupies a thread for the whole request;
+these views serve the common reads (an authenticated JSON GET of a post or
+of a plain list page) on the event loop with Django's async ORM and cache
+methods. Anything else, i.e. writes, `expand`/`view`/filter/ordering
+params, the browsable API and failed authentication, is handed to the DRF
+view they wrap, so every response matches the sync deployment's.
+
+Enabled with BLOG_ASYNC_READS=True (see blog.urls).
+'''
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from vmbloggr.renderers import TimedJSONRenderer
+
+from .models import BlogPost
+from .serializers import BlogPostSerializer
+from . import caching, conditional, views
+
+
+async def authenticate(request):
+    ''' The user of request's access token, or None when DRF should decide.'''
+    authenticator = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+    if not isinstance(authenticator, JWTAuthentication):
+        return None
+    try:
+        # in a thread: loading the user, or claims missing from older tokens, queries the database
+        result = await sync_to_async(authenticator.authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        # DRF answers with the matching 401
+        return None
+    return result and result[0]
+
+
+class AsyncReadView(View):
+    ''' Serve fast-path GETs on the event loop, everything else through sync_view.'''
+    sync_view = None
+    allow = ''
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # the DRF view behind it does its own CSRF checks; csrf_exempt is not async-aware on Django 4.2
+        view.csrf_exempt = True
+        return view
+
+    async def fallback(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        return await self.fallback(request, *args, **kwargs)
+
+    def is_fast_path(self, request):
+        # the browsable API and ?format= go through DRF's content negotiation
+        return 'text/html' not in request.headers.get('Accept', '') and 'format' not in request.GET
+
+    def render(self, data):
+        response = HttpResponse(TimedJSONRenderer().render(data), content_type='application/json')
+        response['Allow'] = self.allow
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    async def cached_conditional_response(self, request, get_key, get_validators, get_data):
+        ''' CachedConditionalReadMixin.cached_conditional_response() with async callables.
+
+        Returns None when get_validators or get_data finds nothing, for the sync view to answer.
+        '''
+        key = await get_key() if caching.is_enabled() else None
+        entry = await caching.afetch(key) if key else None
+        if entry is not None:
+            return conditional.respond(request, caching.entry_validators(entry), lambda: self.render(entry['data']))
+
+        validators = await get_validators()
+        if validators is None:
+            return None
+        response = conditional.not_modified(request, *validators)
+        if response is None:
+            data = await get_data()
+            if data is None:
+                return None
+            if key:
+                await caching.astore(key, caching.entry(data, validators))
+            response = self.render(data)
+        return conditional.set_validators(response, *validators)
+
+
+class AsyncBlogPostList(AsyncReadView):
+    sync_view = staticmethod(views.BlogPostList.as_view())
+    allow = 'GET, HEAD, OPTIONS'
+    page_query_param = 'page'
+
+    def is_fast_path(self, request):
+        # only plain pages; filters, ordering, projections and cursors go to the sync view
+        return super().is_fast_path(request) and set(request.GET) <= {self.page_query_param}
+
+    async def get(self, request):
+        response = None
+        if self.is_fast_path(request) and (user := await authenticate(request)) is not None:
+            request.user = user
+            queryset = BlogPost.objects.order_by(*views.BlogPostList.ordering)
+            response = await self.cached_conditional_response(
+                request,
+                lambda: caching.alist_key(request),
+                lambda: sync_to_async(conditional.collection_validators)(request),
+                lambda: self.get_page(request, queryset),
+            )
+        return response or await self.fallback(request)
+
+    async def get_page(self, request, queryset):
+        ''' The sync view's page body, or None for an invalid page.'''
+        paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+        try:
+            posts = await sync_to_async(paginator.paginate_queryset)(queryset, Request(request))
+        except NotFound:
+            return None
+        return paginator.get_paginated_response(BlogPostSerializer(posts, many=True).data).data
+
+
+class AsyncBlogPostDetails(AsyncReadView):
+    sync_view = staticmethod(views.BlogPostDetails.as_view())
+    allow = 'GET, PUT, PATCH, DELETE, HEAD, OPTIONS'
+
+    def is_fast_path(self, request):
+        # ?expand=author goes to the sync view
+        return super().is_fast_path(request) and not request.GET
+
+    async def get(self, request, pk):
+        response = None
+        if self.is_fast_path(request) and (user := await authenticate(request)) is not None:
+            request.user = user
+            queryset = BlogPost.objects.all()
+            response = await self.cached_conditional_response(
+                request,
+                lambda: caching.adetail_key(request, pk),
+                lambda: conditional.apost_validators(request, queryset, pk),
+                lambda: self.get_data(queryset, pk),
+            )
+        return response or await self.fallback(request, pk=pk)
+
+    async def get_data(self, queryset, pk):
+        post = await queryset.filter(pk=pk).afirst()
+        return None if post is None else BlogPostSerializer(post).data
+
+    async def put(self, request, pk):
+        return await self.fallback(request, pk=pk)
+
+    async def patch(self, request, pk):
+        return await self.fallback(request, pk=pk)
+
+    async def delete(self, request, pk):
+        return await self.fallback(request, pk=pk)
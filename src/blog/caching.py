@@ -0,0 +1,177 @@
+''' Versioned read-through cache for serialized blog post responses.
+
+Entries are never deleted explicitly. Every key embeds a version number and
+writes bump the versions instead, so stale entries simply stop being
+addressed and age out of the backend:
+
+* a per-post version, bumped when that post changes (detail responses)
+* a collection version, bumped when any post changes (list responses)
+* an authors version, bumped when an author is renamed (`?expand=author` responses)
+
+The a-prefixed functions are the same reads and writes for async views.
+'''
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from vmbloggr import metrics
+
+COLLECTION_VERSION_KEY = 'blog:posts:version'
+POST_VERSION_KEY = 'blog:post:%s:version'
+AUTHORS_VERSION_KEY = 'blog:authors:version'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    return caches[settings.BLOG_CACHE_ALIAS]
+
+
+def is_enabled():
+    return settings.BLOG_CACHE_ENABLED
+
+
+def _get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # seed from the clock so an evicted version key never reuses old entries
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(key):
+    cache = get_cache()
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump_version(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def expands_author(request):
+    return 'author' in request.GET.get('expand', '').split(',')
+
+
+def authors_version():
+    return _get_version(AUTHORS_VERSION_KEY)
+
+
+def _authors_version(request):
+    # `?expand=author` embeds usernames, which change without the posts
+    return authors_version() if expands_author(request) else ''
+
+
+async def _aauthors_version(request):
+    return await _aget_version(AUTHORS_VERSION_KEY) if expands_author(request) else ''
+
+
+def _digest(request):
+    # the absolute uri covers query params and the host used in pagination links
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+def list_key(request):
+    return 'blog:list:%s:%s:%s' % (_get_version(COLLECTION_VERSION_KEY), _authors_version(request), _digest(request))
+
+
+def detail_key(request, pk):
+    return 'blog:post:%s:%s:%s:%s' % (
+        pk, _get_version(POST_VERSION_KEY % pk), _authors_version(request), _digest(request),
+    )
+
+
+async def alist_key(request):
+    return 'blog:list:%s:%s:%s' % (
+        await _aget_version(COLLECTION_VERSION_KEY), await _aauthors_version(request), _digest(request),
+    )
+
+
+async def adetail_key(request, pk):
+    return 'blog:post:%s:%s:%s:%s' % (
+        pk, await _aget_version(POST_VERSION_KEY % pk), await _aauthors_version(request), _digest(request),
+    )
+
+
+def entry(data, validators):
+    ''' Cache entry of a response: its data with the (etag, last_modified) validators.'''
+    etag, last_modified = validators
+    return {'data': data, 'etag': etag, 'last_modified': last_modified}
+
+
+def entry_validators(entry):
+    return entry['etag'], entry['last_modified']
+
+
+def fetch(key):
+    ''' Return the cached data for key, or None on a miss.'''
+    data = get_cache().get(key)
+    with _stats_lock:
+        _stats['misses' if data is None else 'hits'] += 1
+    metrics.record_cache_lookup(data is not None)
+    return data
+
+
+def store(key, data):
+    get_cache().set(key, data, timeout=settings.BLOG_CACHE_TIMEOUT)
+
+
+async def afetch(key):
+    data = await get_cache().aget(key)
+    with _stats_lock:
+        _stats['misses' if data is None else 'hits'] += 1
+    metrics.record_cache_lookup(data is not None)
+    return data
+
+
+async def astore(key, data):
+    await get_cache().aset(key, data, timeout=settings.BLOG_CACHE_TIMEOUT)
+
+
+def _bump_versions(pks):
+    for pk in pks:
+        _bump_version(POST_VERSION_KEY % pk)
+    _bump_version(COLLECTION_VERSION_KEY)
+
+
+def invalidate_posts(*pks):
+    ''' Retire the cached responses of the given posts and of every list page.'''
+    _bump_versions(pks)
+    # bump again on commit: a response cached from the old rows while the
+    # writing transaction was still open would otherwise outlive it
+    transaction.on_commit(lambda: _bump_versions(pks))
+
+
+def invalidate_authors():
+    ''' Retire the cached `?expand=author` responses, after an author is renamed.'''
+    _bump_version(AUTHORS_VERSION_KEY)
+    transaction.on_commit(lambda: _bump_version(AUTHORS_VERSION_KEY))
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / lookups if lookups else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats['hits'] = _stats['misses'] = 0
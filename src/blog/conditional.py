@@ -0,0 +1,83 @@
+''' ETag / Last-Modified validators for conditional GETs on blog posts.
+
+Validators are computed from `date_modified` (and, for `?expand=author`,
+the embedded usernames) so a client polling an unchanged post or page gets a
+304 without the body ever being loaded or serialized.
+'''
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import caching
+from .models import BlogPost
+
+
+def _validators(request, last_modified, *parts):
+    # the representation depends on the query string (paging, projections)
+    digest = hashlib.md5(':'.join([request.get_full_path(), *map(str, parts)]).encode()).hexdigest()
+    return quote_etag(digest), int(last_modified.timestamp()) if last_modified else None
+
+
+def _post_columns(request):
+    # `?expand=author` embeds the username, which changes without the post
+    return ('date_modified', 'author__username') if caching.expands_author(request) else ('date_modified',)
+
+
+def _post_validators(request, pk, row):
+    if row is None:
+        return None
+    modified, *author = row
+    return _validators(request, modified, pk, modified.isoformat(), *author)
+
+
+def post_validators(request, queryset, pk):
+    ''' (etag, last_modified) of a single post, or None if it does not exist.'''
+    return _post_validators(request, pk, queryset.filter(pk=pk).values_list(*_post_columns(request)).first())
+
+
+async def apost_validators(request, queryset, pk):
+    return _post_validators(request, pk, await queryset.filter(pk=pk).values_list(*_post_columns(request)).afirst())
+
+
+def collection_validators(request):
+    ''' (etag, last_modified) of a list of posts, from max(date_modified) and the number of posts.
+
+    Soft-deleted posts are included: deleting a post stamps it, and is a
+    change to the lists it was on. A hard delete (the admin, purges) leaves
+    no row to stamp, but changes the count in the ETag; Last-Modified cannot
+    show it, so clients sending only If-Modified-Since miss it.
+
+    `?expand=author` lists add the authors version of the blog cache, and go
+    without validators when each worker has its own cache to count renames in.
+    '''
+    parts = []
+    if caching.expands_author(request):
+        if not settings.CACHE_SHARED:
+            return None
+        parts.append(caching.authors_version())
+    stats = BlogPost.all_objects.aggregate(last_modified=Max('date_modified'), count=Count('pk'))
+    last_modified = stats['last_modified']
+    return _validators(request, last_modified, last_modified and last_modified.isoformat(), stats['count'], *parts)
+
+
+def not_modified(request, etag, last_modified):
+    ''' A 304 response when the client's copy is current, otherwise None.'''
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def respond(request, validators, render):
+    ''' A 304 when the client's copy matches validators, otherwise render(); either carries them.'''
+    response = not_modified(request, *validators)
+    if response is None:
+        response = render()
+    return set_validators(response, *validators)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
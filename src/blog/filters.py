@@ -0,0 +1,26 @@
+import django_filters
+
+from .models import BlogPost
+from . import search
+
+
+class BlogPostFilter(django_filters.FilterSet):
+    ''' `?author=<id>` narrows a listing to one author's posts.'''
+    author = django_filters.NumberFilter(field_name='author_id')
+
+    class Meta:
+        model = BlogPost
+        fields = ['author']
+
+
+class BlogPostSearchFilter(BlogPostFilter):
+    ''' `?q=<terms>` full-text search, optionally narrowed by author and creation date.'''
+    q = django_filters.CharFilter(method='filter_search', required=True)
+    created_after = django_filters.IsoDateTimeFilter(field_name='date_created', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='date_created', lookup_expr='lt')
+
+    class Meta(BlogPostFilter.Meta):
+        fields = ['q', 'author', 'created_after', 'created_before']
+
+    def filter_search(self, queryset, name, value):
+        return search.search(queryset, value)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-date_created', '-id'], name='blog_post_created_id_idx'),
+        ),
+    ]
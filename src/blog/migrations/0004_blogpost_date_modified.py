@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:40
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def backfill_date_modified(apps, schema_editor):
+    # existing posts were last modified when they were created
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogPost.objects.filter(date_created__isnull=False).update(date_modified=F('date_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blogpost_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='date_modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_date_modified, migrations.RunPython.noop),
+    ]
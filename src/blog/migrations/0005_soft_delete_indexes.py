@@ -0,0 +1,25 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blogpost_date_modified'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='blogpost',
+            name='blog_post_created_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-date_created', '-id'], name='blog_post_live_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['date_modified'], name='blog_post_tombstone_idx'),
+        ),
+    ]
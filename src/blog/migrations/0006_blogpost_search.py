@@ -0,0 +1,99 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:31
+
+from django.db import migrations
+
+# the search index is kept out of the model and maintained by triggers, so
+# bulk_create, bulk_update and queryset.update() keep it current as well
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(%(row)s.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(%(row)s.subtitle, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(%(row)s.body, '')), 'C')"
+)
+
+POSTGRES_FORWARDS = [
+    'ALTER TABLE blog_blogpost ADD COLUMN search_vector tsvector',
+    f'''
+    CREATE FUNCTION blog_blogpost_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {POSTGRES_VECTOR % {'row': 'NEW'}};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER blog_blogpost_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, subtitle, body ON blog_blogpost
+    FOR EACH ROW EXECUTE PROCEDURE blog_blogpost_search_vector_update()
+    ''',
+    f'UPDATE blog_blogpost SET search_vector = {POSTGRES_VECTOR % {"row": "blog_blogpost"}}',
+    'CREATE INDEX blog_post_search_idx ON blog_blogpost USING GIN (search_vector)',
+]
+
+POSTGRES_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS blog_blogpost_search_vector_trigger ON blog_blogpost',
+    'DROP FUNCTION IF EXISTS blog_blogpost_search_vector_update()',
+    'DROP INDEX IF EXISTS blog_post_search_idx',
+    'ALTER TABLE blog_blogpost DROP COLUMN IF EXISTS search_vector',
+]
+
+# external-content FTS5 table: only the index is stored, the text stays in
+# blog_blogpost. Django rebuilds SQLite tables for some ALTERs, which drops
+# their triggers, so a later migration that does so must recreate them.
+SQLITE_FORWARDS = [
+    '''
+    CREATE VIRTUAL TABLE blog_blogpost_fts USING fts5(
+        title, subtitle, body,
+        content='blog_blogpost', content_rowid='id', tokenize='porter unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER blog_blogpost_fts_insert AFTER INSERT ON blog_blogpost BEGIN
+        INSERT INTO blog_blogpost_fts(rowid, title, subtitle, body)
+        VALUES (new.id, new.title, new.subtitle, new.body);
+    END
+    ''',
+    '''
+    CREATE TRIGGER blog_blogpost_fts_delete AFTER DELETE ON blog_blogpost BEGIN
+        INSERT INTO blog_blogpost_fts(blog_blogpost_fts, rowid, title, subtitle, body)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.body);
+    END
+    ''',
+    '''
+    CREATE TRIGGER blog_blogpost_fts_update AFTER UPDATE OF title, subtitle, body ON blog_blogpost BEGIN
+        INSERT INTO blog_blogpost_fts(blog_blogpost_fts, rowid, title, subtitle, body)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.body);
+        INSERT INTO blog_blogpost_fts(rowid, title, subtitle, body)
+        VALUES (new.id, new.title, new.subtitle, new.body);
+    END
+    ''',
+    "INSERT INTO blog_blogpost_fts(blog_blogpost_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS blog_blogpost_fts_insert',
+    'DROP TRIGGER IF EXISTS blog_blogpost_fts_delete',
+    'DROP TRIGGER IF EXISTS blog_blogpost_fts_update',
+    'DROP TABLE IF EXISTS blog_blogpost_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARDS, 'sqlite': SQLITE_FORWARDS}),
+            run({'postgresql': POSTGRES_BACKWARDS, 'sqlite': SQLITE_BACKWARDS}),
+        ),
+    ]
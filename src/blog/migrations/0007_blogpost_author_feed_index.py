@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blogpost_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['author', '-date_created', '-id'], name='blog_post_live_author_idx'),
+        ),
+    ]
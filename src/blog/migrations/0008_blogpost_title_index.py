@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_blogpost_author_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['title', 'id'], name='blog_post_live_title_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_blogpost_title_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['date_modified'], name='blog_post_live_modified_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_blogpost_live_modified_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='blogpost',
+            name='blog_post_live_modified_idx',
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['date_modified'], name='blog_post_modified_idx'),
+        ),
+    ]
@@ -1,28 +1,40 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from users.models import User
 
+from . import caching
+
 
 class BlogPostModelManager(models.Manager):
-    
+    ''' Default manager: soft-deleted posts are never returned.'''
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
     def delete(self, id):
         ''' delete a single blog post'''
-        blog = self.get(pk=id)
-        if (not blog.is_deleted):
-            blog.is_deleted = True
-        return
-        
+        return self.delete_many([id])
+
+    def delete_many(self, ids):
+        ''' soft delete blog posts with a single UPDATE'''
+        ids = list(ids)
+        deleted = self.filter(pk__in=ids).update(is_deleted=True, date_modified=timezone.now())
+        # update() bypasses post_save, so retire the cached responses here
+        caching.invalidate_posts(*ids)
+        return deleted
+
     def get_all(self):
         ''' get all blog posts'''
-        query = self.get_queryset()
-        return query.filter(is_deleted=False)
+        return self.get_queryset()
     
     def find(self, id):
         ''' get a single blog post '''
         return self.get(pk=id)
     
     def find_by_author(self, author_id):
-        ''' search for all blog posts by a common author'''
-        return self.get_queryset().filter(author=author_id)
+        ''' search for all live blog posts by a common author'''
+        return self.get_queryset().filter(author_id=author_id)
 
     
 
@@ -32,9 +44,47 @@ class BlogPost(models.Model):
     subtitle = models.CharField(max_length=100)
     body = models.TextField(null=True, blank=True)
     date_created = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    date_modified = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
 
     objects = BlogPostModelManager()
+    # includes soft-deleted posts, for the admin and tombstone purges
+    all_objects = models.Manager()
 
     def __repr__(self) -> str:
-        return self.title
\ No newline at end of file
+        return self.title
+
+    def soft_delete(self):
+        ''' flag this post as deleted with a single UPDATE'''
+        self.is_deleted = True
+        self.save(update_fields=['is_deleted', 'date_modified'])
+
+    class Meta:
+        indexes = [
+            # backs keyset (cursor) pagination of the blog list; only live posts are indexed
+            models.Index(
+                fields=['-date_created', '-id'],
+                name='blog_post_live_created_id_idx',
+                condition=Q(is_deleted=False),
+            ),
+            # `?ordering=title` on the blog list, with the id tie-breaker
+            models.Index(
+                fields=['title', 'id'],
+                name='blog_post_live_title_idx',
+                condition=Q(is_deleted=False),
+            ),
+            # per-author feeds: an author's live posts, newest first, by cursor
+            models.Index(
+                fields=['author', '-date_created', '-id'],
+                name='blog_post_live_author_idx',
+                condition=Q(is_deleted=False),
+            ),
+            # max(date_modified) of every post, tombstones included, for the blog list's validators
+            models.Index(fields=['date_modified'], name='blog_post_modified_idx'),
+            # lets purge_deleted_posts find old tombstones without scanning live posts
+            models.Index(
+                fields=['date_modified'],
+                name='blog_post_tombstone_idx',
+                condition=Q(is_deleted=True),
+            ),
+        ]
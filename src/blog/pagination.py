@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BlogPostCursorPagination(CursorPagination):
+    ''' Keyset pagination over (date_created, id), newest first.
+
+    Each page is fetched with a `WHERE date_created < <cursor>` range scan on
+    the (date_created, id) index instead of an OFFSET, and no COUNT(*) is run,
+    so deep pages cost the same as the first one.
+    '''
+    ordering = ('-date_created', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def use_cursor_pagination(request):
+    ''' Cursor mode is opt-in: `?pagination=cursor`, or any request carrying a cursor.'''
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or BlogPostCursorPagination.cursor_query_param in params
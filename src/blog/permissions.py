@@ -7,5 +7,6 @@ class IsBlogPostAuthorOrReadOnly(permissions.BasePermission):
         # allow GET, HEAD, and OPTIONS requests (read-only)
         if request.method in permissions.SAFE_METHODS:
             return True
-        # check if the requesting user is the owner of the blog post
-        return obj.author == request.user
\ No newline at end of file
+        # check if the requesting user is the owner of the blog post;
+        # compare ids so the author row is never loaded
+        return obj.author_id is not None and obj.author_id == request.user.pk
\ No newline at end of file
@@ -0,0 +1,59 @@
+''' Ranked full-text search over blog post titles, subtitles and bodies.
+
+The index is maintained by database triggers (migration 0006), not by the
+model, and is queried with raw SQL fragments per backend:
+
+* PostgreSQL: the weighted `search_vector` tsvector column and its GIN index;
+  queries use websearch syntax (quoted phrases, `or`, `-term`)
+* SQLite: the `blog_blogpost_fts` FTS5 table; every term must match
+'''
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+# bm25 column weights for title, subtitle and body, mirroring the A/B/C weights on Postgres
+FTS5_WEIGHTS = '10.0, 4.0, 1.0'
+
+
+def _postgres_expressions(table, text):
+    query = 'websearch_to_tsquery(%s::regconfig, %s)'
+    params = [SEARCH_CONFIG, text]
+    match = RawSQL(f'{table}.search_vector @@ {query}', params, output_field=BooleanField())
+    rank = RawSQL(f'ts_rank({table}.search_vector, {query})', params, output_field=FloatField())
+    return match, rank
+
+
+def _fts5_query(text):
+    # quote every term so user input is never parsed as FTS5 query syntax
+    return ' '.join('"%s"' % term.replace('"', '""') for term in text.split())
+
+
+def _sqlite_expressions(table, text):
+    fts = f'{table}_fts'
+    params = [_fts5_query(text)]
+    match = RawSQL(
+        f'{table}.id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)',
+        params, output_field=BooleanField(),
+    )
+    # bm25() is smaller for better matches
+    rank = RawSQL(
+        f'(SELECT -bm25({fts}, {FTS5_WEIGHTS}) FROM {fts} WHERE {fts} MATCH %s AND rowid = {table}.id)',
+        params, output_field=FloatField(),
+    )
+    return match, rank
+
+
+def search(queryset, text):
+    ''' Filter queryset to the posts matching text, best first, annotated with `rank`.'''
+    if not text.split():
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    table = queryset.model._meta.db_table
+    if vendor == 'postgresql':
+        match, rank = _postgres_expressions(table, text)
+    elif vendor == 'sqlite':
+        match, rank = _sqlite_expressions(table, text)
+    else:
+        raise NotImplementedError(f'Full-text search is not available on {vendor}.')
+    return queryset.filter(match).annotate(rank=rank).order_by('-rank', '-id')
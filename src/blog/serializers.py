@@ -1,6 +1,12 @@
+from collections import Counter
+
+from django.db import transaction
 from rest_framework import serializers
+from . import caching
 from .models import BlogPost
 from users.models import User
+from users.serializers import UserSerializer
+from vmbloggr.serializers import TimedSerializerMixin
 
 
 # class BlogPostSerializer(serializers.ModelSerializer):
@@ -17,21 +23,86 @@ from users.models import User
 #     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class AuthorSerializer(UserSerializer):
+    ''' Compact author representation nested in blog posts.'''
+    class Meta(UserSerializer.Meta):
+        fields = ['id', 'username']
+
+
+class ExpandableAuthorMixin:
+    ''' Nest the author instead of its id when the view asks for `expand=author`.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.context.get('expand_author'):
+            self.fields['author'] = AuthorSerializer(read_only=True)
+
+
+class BlogPostSerializer(TimedSerializerMixin, ExpandableAuthorMixin, serializers.ModelSerializer):
     class Meta:
         model = BlogPost
         fields = '__all__'
 
-class BlogPostCreateSerializer(serializers.ModelSerializer):
+class BlogPostSearchSerializer(BlogPostSerializer):
+    ''' A matching post and its relevance, higher is better.'''
+    rank = serializers.FloatField(read_only=True)
+
+class BlogPostSummarySerializer(TimedSerializerMixin, ExpandableAuthorMixin, serializers.ModelSerializer):
+    ''' Compact listing representation that leaves out the full post body.'''
+    excerpt = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = BlogPost
+        fields = ['id', 'title', 'subtitle', 'author', 'date_created', 'excerpt']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the excerpt is only present when the queryset annotated one
+        if not self.context.get('with_excerpt'):
+            self.fields.pop('excerpt')
+
+class BlogPostBulkCreateSerializer(serializers.ListSerializer):
+    ''' Create a list of posts with a single INSERT.'''
+
+    def create(self, validated_data):
+        author_id = self.context['request'].user.pk
+        posts = [BlogPost(author_id=author_id, **item) for item in validated_data]
+        with transaction.atomic():
+            posts = BlogPost.objects.bulk_create(posts)
+        # bulk_create sends no post_save, so retire the cached list pages here
+        caching.invalidate_posts()
+        return posts
+
+class BlogPostCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = BlogPost
         fields = ['title', 'subtitle', 'body']
+        list_serializer_class = BlogPostBulkCreateSerializer
 
     def create(self, validated_data):
         # Add the current user as the author of the blog post
-        validated_data['author'] = self.context['request'].user
+        validated_data.setdefault('author_id', self.context['request'].user.pk)
         return super().create(validated_data)
     
+class BlogPostBulkUpdateListSerializer(serializers.ListSerializer):
+    ''' The items of a bulk update; each post may appear once.'''
+
+    def validate(self, attrs):
+        counts = Counter(item['id'] for item in attrs)
+        duplicates = sorted(pk for pk, count in counts.items() if count > 1)
+        if duplicates:
+            raise serializers.ValidationError(f"Duplicate ids in the batch: {', '.join(map(str, duplicates))}.")
+        return attrs
+
+class BlogPostBulkUpdateSerializer(serializers.ModelSerializer):
+    ''' One item of a bulk update: the post id and the fields to change.'''
+    id = serializers.IntegerField()
+
+    class Meta:
+        model = BlogPost
+        fields = ['id', 'title', 'subtitle', 'body']
+        list_serializer_class = BlogPostBulkUpdateListSerializer
+
 class AllBlogPostsSerializer(serializers.ModelSerializer):
     class Meta:
         model = BlogPost
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from users.models import User
+
+from . import caching
+from .models import BlogPost
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_cached_post(sender, instance, **kwargs):
+    ''' Retire cached detail and list responses whenever a post is written.'''
+    caching.invalidate_posts(instance.pk)
+
+
+@receiver(post_init, sender=User)
+def note_username(sender, instance, **kwargs):
+    ''' Remember the username a user was loaded with, to spot renames on save.'''
+    # a deferred username is not loaded just for this
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def invalidate_renamed_author(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    ''' Retire the `?expand=author` responses, which embed a renamed author's username.'''
+    # e.g. the last_login update of every login
+    if created or raw or (update_fields is not None and 'username' not in update_fields):
+        return
+    if instance.username != instance._loaded_username:
+        instance._loaded_username = instance.username
+        caching.invalidate_authors()
@@ -1,15 +1,29 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.test import APIClient
 
+from . import caching
+from .async_views import AsyncBlogPostDetails, AsyncBlogPostList
 from .models import BlogPost
 from blog.models import BlogPost
 from .serializers import BlogPostSerializer, AllBlogPostsSerializer
 from users.models import User  
+from vmbloggr.testing import QueryPlanAssertionsMixin
 
 class BlogPostAPITests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         # Create a user for testing
         self.author = User.objects.create(
@@ -60,7 +74,7 @@ class BlogPostAPITests(TestCase):
         api_blogs = response.data['results']
 
         # query list of blogs from the database
-        db_blogs = BlogPost.objects.get_all().values('id', 'title', 'subtitle', 'body')
+        db_blogs = BlogPost.objects.get_all().order_by('-date_created', '-id').values('id', 'title', 'subtitle', 'body')
 
         # assert that number of blogs retrieved via API matches the number of blogs in the database
         self.assertEqual(len(api_blogs), db_blogs.count())
@@ -88,7 +102,9 @@ class BlogPostAPITests(TestCase):
         api_blogs = response.data['results']
 
         # get the list of blogs directly from the database
-        undeleted_db_blogs = BlogPost.objects.get_all().values('id', 'title', 'subtitle', 'body')
+        undeleted_db_blogs = BlogPost.objects.get_all().order_by('-date_created', '-id').values(
+            'id', 'title', 'subtitle', 'body',
+        )
 
         # assert that the number of blogs retrieved via API matches the number of undeleted blogs in the database
         self.assertEqual(len(api_blogs), undeleted_db_blogs.count())
@@ -182,6 +198,702 @@ class BlogPostAPITests(TestCase):
         self.assertEqual(self.blog1.subtitle, "Some subtitle")
         self.assertEqual(self.blog1.body, "Some body :) haha.")
 
+    def test_list_blog_posts_cursor_pagination(self):
+        self.client.force_authenticate(user=self.author)
+        url = reverse('blog-posts-list')
+        response = self.client.get(url, {'pagination': 'cursor', 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # cursor pages skip the COUNT(*) but keep the `results` envelope, newest first
+        self.assertNotIn('count', response.data)
+        self.assertEqual([blog['id'] for blog in response.data['results']], [self.blog2.id])
+        self.assertIsNotNone(response.data['next'])
+
+        # follow the opaque cursor to the next page
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([blog['id'] for blog in response.data['results']], [self.blog1.id])
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_list_blog_posts_invalid_cursor(self):
+        self.client.force_authenticate(user=self.author)
+        url = reverse('blog-posts-list')
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_blog_posts_summary_view_omits_body(self):
+        self.client.force_authenticate(user=self.author)
+        url = reverse('blog-posts-list')
+        response = self.client.get(url, {'view': 'summary'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for api_blog in response.data['results']:
+            self.assertEqual(set(api_blog), {'id', 'title', 'subtitle', 'author', 'date_created'})
+
+    def test_list_blog_posts_summary_view_with_excerpt(self):
+        self.client.force_authenticate(user=self.author)
+        url = reverse('blog-posts-list')
+        response = self.client.get(url, {'view': 'summary', 'excerpt': 9})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        excerpts = {api_blog['id']: api_blog['excerpt'] for api_blog in response.data['results']}
+        self.assertEqual(excerpts[self.blog1.id], "Some body")
+        self.assertNotIn('body', response.data['results'][0])
+
+    def test_retrieve_blog_post_keeps_full_body(self):
+        self.client.force_authenticate(user=self.author)
+        url = reverse('blog-post-detail', args=[self.blog1.id])
+        response = self.client.get(url, {'view': 'summary'})
+        self.assertEqual(response.data['body'], self.blog1.body)
+
+
+class BlogAPITestCase(TestCase):
+    ''' An API client authenticated as `author`, a second user and an empty cache.'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.author = User.objects.create(
+            username="testuser1",
+            password="testpassword1",
+            email='er@gmail.com',
+            phone_number="+23407033795721"
+        )
+        self.other_user = User.objects.create(
+            username="testuser3",
+            password="testpassword",
+            email='user3@gmail.com',
+            phone_number="+23307044795721"
+        )
+        self.client.force_authenticate(user=self.author)
+
+    def create_post(self, **fields):
+        fields = {'author': self.author, 'title': "Some title", 'subtitle': "Some subtitle",
+                  'body': "Some body :) haha.", **fields}
+        return BlogPost.objects.create(**fields)
+
+    def create_posts(self, count):
+        return [self.create_post(title=f"Title {i}", subtitle=f"Subtitle {i}", body=f"Body {i}") for i in range(count)]
+
+
+@override_settings(BLOG_CACHE_ENABLED=True)
+class BlogPostCacheTests(BlogAPITestCase):
+    def setUp(self):
+        super().setUp()
+        caching.reset_stats()
+        self.blog = self.create_post()
+
+    def test_list_blog_posts_served_from_cache(self):
+        url = reverse('blog-posts-list')
+        first = self.client.get(url)
+
+        # a repeated request never reaches the database
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(caching.stats()['hits'], 1)
+        self.assertEqual(caching.stats()['misses'], 1)
+
+    def test_retrieve_blog_post_served_from_cache(self):
+        url = reverse('blog-post-detail', args=[self.blog.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['title'], "Some title")
+
+    def test_saving_blog_post_invalidates_cached_responses(self):
+        list_url = reverse('blog-posts-list')
+        detail_url = reverse('blog-post-detail', args=[self.blog.id])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        self.blog.title = "Updated title"
+        self.blog.save()
+
+        self.assertEqual(self.client.get(detail_url).data['title'], "Updated title")
+        self.assertEqual(self.client.get(list_url).data['results'][0]['title'], "Updated title")
+
+    def test_creating_blog_post_invalidates_cached_list(self):
+        url = reverse('blog-posts-list')
+        self.assertEqual(self.client.get(url).data['count'], 1)
+
+        BlogPost.objects.create(author=self.author, title="Another", subtitle="Another")
+        self.assertEqual(self.client.get(url).data['count'], 2)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_renaming_author_invalidates_cached_responses(self):
+        list_url = reverse('blog-posts-list')
+        detail_url = reverse('blog-post-detail', args=[self.blog.id])
+        etag = self.client.get(detail_url, {'expand': 'author'})['ETag']
+        list_etag = self.client.get(list_url, {'expand': 'author'})['ETag']
+        modified = self.blog.date_modified
+
+        self.author.username = "renamed1"
+        # the posts themselves are not written
+        with self.assertNumQueries(1):
+            self.author.save()
+
+        response = self.client.get(detail_url, {'expand': 'author'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['author']['username'], "renamed1")
+        response = self.client.get(list_url, {'expand': 'author'}, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['author']['username'], "renamed1")
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.date_modified, modified)
+
+    def test_login_leaves_cached_responses(self):
+        url = reverse('blog-post-detail', args=[self.blog.id])
+        self.client.get(url, {'expand': 'author'})
+        self.author.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            self.author.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(url, {'expand': 'author'})
+
+    def test_cache_stats_restricted_to_admin(self):
+        url = reverse('blog-cache-stats')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.author.is_staff = True
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'hits', 'misses', 'hit_ratio'})
+
+
+class BlogPostConditionalGetTests(BlogAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.blog = self.create_post()
+
+    def test_retrieve_blog_post_not_modified(self):
+        url = reverse('blog-post-detail', args=[self.blog.id])
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_blog_post_not_modified_without_cache(self):
+        url = reverse('blog-post-detail', args=[self.blog.id])
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+
+        # only the date_modified lookup runs, the post itself is never loaded
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_blog_post_modified_since_etag(self):
+        url = reverse('blog-post-detail', args=[self.blog.id])
+        etag = self.client.get(url)['ETag']
+
+        self.blog.title = "Updated title"
+        self.blog.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_blog_posts_not_modified(self):
+        url = reverse('blog-posts-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # a new post changes the collection etag
+        BlogPost.objects.create(author=self.author, title="Another", subtitle="Another")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_blog_posts_modified_by_delete(self):
+        url = reverse('blog-posts-list')
+        BlogPost.objects.create(author=self.author, title="Latest", subtitle="Latest")
+
+        # neither the latest date_modified of the live posts nor an estimated count need change
+        with self.settings(PAGINATION_COUNT_CACHE_TIMEOUT=60):
+            etag = self.client.get(url)['ETag']
+            BlogPost.objects.get(pk=self.blog.pk).soft_delete()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_blog_posts_modified_by_hard_delete(self):
+        url = reverse('blog-posts-list')
+        BlogPost.objects.create(author=self.author, title="Latest", subtitle="Latest")
+        etag = self.client.get(url)['ETag']
+
+        # leaves the latest date_modified as it was
+        BlogPost.all_objects.filter(pk=self.blog.pk).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_blog_posts_not_modified_since(self):
+        url = reverse('blog-posts-list')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_blog_posts_modified_since_delete(self):
+        url = reverse('blog-posts-list')
+        latest = BlogPost.objects.create(author=self.author, title="Latest", subtitle="Latest")
+        # Last-Modified has a resolution of seconds
+        BlogPost.objects.filter(pk=self.blog.pk).update(date_modified=timezone.now() - timedelta(days=2))
+        BlogPost.objects.filter(pk=latest.pk).update(date_modified=timezone.now() - timedelta(days=1))
+        last_modified = self.client.get(url)['Last-Modified']
+
+        # deleting a post other than the latest one still advances Last-Modified
+        BlogPost.objects.get(pk=self.blog.pk).soft_delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([blog['id'] for blog in response.data['results']], [latest.id])
+
+
+class BlogPostSoftDeleteTests(BlogAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.blog = self.create_post()
+
+    def test_delete_blog_post_is_soft(self):
+        url = reverse('blog-post-detail', args=[self.blog.id])
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        # the row is kept as a tombstone but hidden from every read path
+        self.assertTrue(BlogPost.all_objects.get(pk=self.blog.id).is_deleted)
+        self.assertFalse(BlogPost.objects.filter(pk=self.blog.id).exists())
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('blog-posts-list')).data['count'], 0)
+
+    def test_manager_delete_hides_cached_post(self):
+        url = reverse('blog-post-detail', args=[self.blog.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            BlogPost.objects.delete(self.blog.id)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_deleted_posts(self):
+        old = BlogPost.objects.create(author=self.author, title="Old", subtitle="Old")
+        recent = BlogPost.objects.create(author=self.author, title="Recent", subtitle="Recent")
+        BlogPost.objects.delete_many([old.id, recent.id])
+        BlogPost.all_objects.filter(pk=old.id).update(date_modified=timezone.now() - timedelta(days=40))
+
+        # the ids of each batch, then a bare DELETE
+        with self.assertNumQueries(3):
+            call_command('purge_deleted_posts', days=30, batch_size=1, stdout=StringIO())
+
+        self.assertFalse(BlogPost.all_objects.filter(pk=old.id).exists())
+        self.assertTrue(BlogPost.all_objects.filter(pk=recent.id).exists())
+        self.assertTrue(BlogPost.objects.filter(pk=self.blog.id).exists())
+
+
+class BlogPostQueryCountTests(BlogAPITestCase):
+    ''' Pin the number of queries per endpoint so N+1 regressions fail.'''
+
+    def setUp(self):
+        super().setUp()
+        self.blog = self.create_posts(5)[-1]
+        self.url = reverse('blog-post-detail', args=[self.blog.id])
+
+    def test_list_query_count(self):
+        # validators, count, page
+        with self.assertNumQueries(3):
+            self.client.get(reverse('blog-posts-list'))
+
+    def test_list_cursor_query_count(self):
+        # validators, page
+        with self.assertNumQueries(2):
+            self.client.get(reverse('blog-posts-list'), {'pagination': 'cursor'})
+
+    def test_retrieve_query_count(self):
+        # validators, post
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_create_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('blog-post-create'),
+                {'title': 'New', 'subtitle': 'New', 'body': 'New'},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_update_query_count(self):
+        # post, update; the permission check never loads the author
+        with self.assertNumQueries(2):
+            response = self.client.put(self.url, {'title': 'New', 'subtitle': 'New', 'body': 'New'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_partial_update_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.patch(self.url, {'body': 'New'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_list_expand_author_query_count(self):
+        other_author = User.objects.create(
+            username="testuser2",
+            password="testpassword2",
+            email='user2@gmail.com',
+            phone_number="+23407044795721"
+        )
+        BlogPost.objects.create(author=other_author, title="Other", subtitle="Other")
+
+        # authors are joined, not fetched per post
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('blog-posts-list'), {'expand': 'author'})
+        authors = {blog['author']['username'] for blog in response.data['results']}
+        self.assertEqual(authors, {"testuser1", "testuser2"})
+
+    @override_settings(CACHE_SHARED=True)
+    def test_list_summary_expand_author_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('blog-posts-list'), {'view': 'summary', 'expand': 'author'})
+        self.assertEqual(response.data['results'][0]['author'], {'id': self.author.id, 'username': "testuser1"})
+
+    def test_retrieve_expand_author(self):
+        response = self.client.get(self.url, {'expand': 'author'})
+        self.assertEqual(response.data['author'], {'id': self.author.id, 'username': "testuser1"})
+
+        # the default representation keeps the raw author id
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['author'], self.author.id)
+
+
+class BlogPostBulkTests(BlogAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.blogs = self.create_posts(3)
+        self.other_blog = BlogPost.objects.create(author=self.other_user, title="Other", subtitle="Other")
+        self.url = reverse('blog-posts-bulk')
+
+    def test_bulk_create(self):
+        posts = [{'title': f'New {i}', 'subtitle': 'New', 'body': 'New'} for i in range(5)]
+        # a single INSERT inside the transaction's savepoint
+        with self.assertNumQueries(3):
+            response = self.client.post(self.url, posts, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(BlogPost.objects.filter(author=self.author, title__startswith='New').count(), 5)
+
+    def test_bulk_create_validates_every_item(self):
+        posts = [{'title': 'New', 'subtitle': 'New'}, {'subtitle': 'Missing title'}]
+        response = self.client.post(self.url, posts, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BlogPost.objects.filter(title='New').exists())
+
+    def test_bulk_update(self):
+        changes = [{'id': blog.id, 'body': f'Updated {blog.id}'} for blog in self.blogs]
+        changes[0]['title'] = 'Updated title'
+        # ownership lookup and one UPDATE, inside the transaction's savepoint
+        with self.assertNumQueries(4):
+            response = self.client.patch(self.url, changes, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for blog in self.blogs:
+            blog.refresh_from_db()
+            self.assertEqual(blog.body, f'Updated {blog.id}')
+        self.assertEqual(self.blogs[0].title, 'Updated title')
+        self.assertEqual(self.blogs[1].title, 'Title 1')
+        self.assertGreater(self.blogs[0].date_modified, self.blogs[0].date_created)
+
+    def test_bulk_update_refreshes_cached_post(self):
+        detail_url = reverse('blog-post-detail', args=[self.blogs[0].id])
+        self.client.get(detail_url)
+        self.client.patch(self.url, [{'id': self.blogs[0].id, 'title': 'Updated title'}], format='json')
+        self.assertEqual(self.client.get(detail_url).data['title'], 'Updated title')
+
+    def test_bulk_update_rejects_foreign_posts(self):
+        changes = [{'id': self.blogs[0].id, 'body': 'Updated'}, {'id': self.other_blog.id, 'body': 'Updated'}]
+        response = self.client.patch(self.url, changes, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['ids'], [self.other_blog.id])
+
+        # nothing in the batch was applied
+        self.blogs[0].refresh_from_db()
+        self.assertEqual(self.blogs[0].body, 'Body 0')
+
+    def test_bulk_update_rejects_duplicate_ids(self):
+        changes = [{'id': self.blogs[0].id, 'title': 'First'}, {'id': self.blogs[0].id, 'body': 'Second'}]
+        response = self.client.patch(self.url, changes, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(self.blogs[0].id), response.data['non_field_errors'][0])
+
+        # neither change was applied
+        self.blogs[0].refresh_from_db()
+        self.assertEqual((self.blogs[0].title, self.blogs[0].body), ('Title 0', 'Body 0'))
+
+    def test_bulk_update_missing_post(self):
+        response = self.client.patch(self.url, [{'id': 999999, 'body': 'Updated'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_delete(self):
+        ids = [blog.id for blog in self.blogs[:2]]
+        # ownership lookup and one soft-delete UPDATE, inside the transaction's savepoint
+        with self.assertNumQueries(4):
+            response = self.client.delete(self.url, ids, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(BlogPost.objects.filter(author=self.author)), [self.blogs[2]])
+        self.assertEqual(BlogPost.all_objects.filter(pk__in=ids, is_deleted=True).count(), 2)
+
+    def test_bulk_delete_rejects_foreign_posts(self):
+        response = self.client.delete(self.url, [self.blogs[0].id, self.other_blog.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(BlogPost.objects.count(), 4)
+
+    def test_bulk_delete_rejects_booleans(self):
+        response = self.client.delete(self.url, [True], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(BlogPost.objects.count(), 4)
+
+    def test_bulk_batch_size_limit(self):
+        with self.settings(BLOG_BULK_MAX_BATCH=2):
+            response = self.client.delete(self.url, [blog.id for blog in self.blogs], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BlogPostSearchTests(BlogAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.title_match = BlogPost.objects.create(
+            author=self.author, title="Django performance", subtitle="Tuning", body="Indexes and caching.",
+        )
+        self.body_match = BlogPost.objects.create(
+            author=self.other_user, title="Weekend notes", subtitle="Misc", body="Some thoughts on Django templates.",
+        )
+        self.no_match = BlogPost.objects.create(
+            author=self.author, title="Gardening", subtitle="Tomatoes", body="Water daily.",
+        )
+        self.url = reverse('blog-posts-search')
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_search_ranks_title_matches_first(self):
+        self.assertEqual(self.search(q='django'), [self.title_match.id, self.body_match.id])
+
+    def test_search_requires_every_term(self):
+        self.assertEqual(self.search(q='django templates'), [self.body_match.id])
+
+    def test_search_stems_terms(self):
+        self.assertEqual(self.search(q='tomato'), [self.no_match.id])
+
+    def test_search_results_carry_rank(self):
+        response = self.client.get(self.url, {'q': 'django'})
+        ranks = [post['rank'] for post in response.data['results']]
+        self.assertGreater(ranks[0], ranks[1])
+
+    def test_search_by_author(self):
+        self.assertEqual(self.search(q='django', author=self.other_user.id), [self.body_match.id])
+
+    def test_search_tolerates_query_syntax(self):
+        self.assertEqual(self.search(q='"django'), [self.title_match.id, self.body_match.id])
+
+    def test_search_requires_query(self):
+        for params in ({}, {'q': '   '}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_updates(self):
+        self.no_match.body = "Moved the tomatoes to a django-themed planter."
+        self.no_match.save()
+        BlogPost.objects.filter(pk=self.body_match.pk).update(body="Nothing relevant.")
+        self.assertEqual(self.search(q='django'), [self.title_match.id, self.no_match.id])
+
+    def test_index_follows_bulk_create(self):
+        post, = BlogPost.objects.bulk_create([BlogPost(author=self.author, title="Flask", subtitle="x", body="x")])
+        self.assertEqual(self.search(q='flask'), [post.id])
+
+    def test_search_skips_deleted_posts(self):
+        self.title_match.soft_delete()
+        self.assertEqual(self.search(q='django'), [self.body_match.id])
+        BlogPost.all_objects.filter(pk=self.title_match.pk).delete()
+        self.assertEqual(self.search(q='django'), [self.body_match.id])
+
+
+class AuthorBlogPostListTests(BlogAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.blogs = self.create_posts(3)
+        self.other_blog = BlogPost.objects.create(author=self.other_user, title="Other", subtitle="Other")
+        self.blogs[1].soft_delete()
+        self.client.force_authenticate(user=self.other_user)
+        self.url = reverse('author-blog-posts-list', args=[self.author.id])
+
+    def test_author_feed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [post['id'] for post in response.data['results']]
+        self.assertEqual(ids, [self.blogs[2].id, self.blogs[0].id])
+
+    def test_author_feed_pages_by_cursor(self):
+        response = self.client.get(self.url, {'page_size': 1})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.blogs[2].id])
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([post['id'] for post in response.data['results']], [self.blogs[0].id])
+        self.assertIsNone(response.data['next'])
+
+    def test_author_feed_of_unknown_author_is_empty(self):
+        response = self.client.get(reverse('author-blog-posts-list', args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+    def test_author_feed_query_count(self):
+        # validators, page
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_list_author_filter(self):
+        response = self.client.get(reverse('blog-posts-list'), {'author': self.other_user.id})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.other_blog.id])
+        self.assertEqual(response.data['count'], 1)
+
+    def test_list_author_filter_invalid(self):
+        response = self.client.get(reverse('blog-posts-list'), {'author': 'someone'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_find_by_author_skips_deleted_posts(self):
+        self.assertEqual(set(BlogPost.objects.find_by_author(self.author.id)), {self.blogs[0], self.blogs[2]})
+
+
+class BlogPostOrderingTests(QueryPlanAssertionsMixin, BlogAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = BlogPost.objects.create(author=self.author, title="Beta", subtitle="x")
+        self.second = BlogPost.objects.create(author=self.author, title="Alpha", subtitle="x")
+        self.third = BlogPost.objects.create(author=self.author, title="Beta", subtitle="x")
+        self.url = reverse('blog-posts-list')
+
+    def ids(self, url=None, **params):
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_default_ordering_is_newest_first(self):
+        self.assertEqual(self.ids(), [self.third.id, self.second.id, self.first.id])
+
+    def test_ordering_by_title_breaks_ties_on_id(self):
+        self.assertEqual(self.ids(ordering='title'), [self.second.id, self.first.id, self.third.id])
+        self.assertEqual(self.ids(ordering='-title'), [self.third.id, self.first.id, self.second.id])
+
+    def test_ordering_by_date_created(self):
+        self.assertEqual(self.ids(ordering='date_created'), [self.first.id, self.second.id, self.third.id])
+
+    def test_ordering_ignores_fields_not_whitelisted(self):
+        self.assertEqual(self.ids(ordering='body'), [self.third.id, self.second.id, self.first.id])
+
+    def test_cursor_pagination_follows_ordering(self):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'ordering': 'title', 'page_size': 2})
+        ids = [post['id'] for post in response.data['results']]
+        ids += [post['id'] for post in self.client.get(response.data['next']).data['results']]
+        self.assertEqual(ids, [self.second.id, self.first.id, self.third.id])
+
+    def test_list_uses_indexes(self):
+        self.assertIndexScan(self.ordered_query(self.url), 'blog_post_live_created_id_idx')
+        self.assertIndexScan(self.ordered_query(self.url, {'ordering': 'date_created'}), 'blog_post_live_created_id_idx')
+        self.assertIndexScan(self.ordered_query(self.url, {'ordering': '-title'}), 'blog_post_live_title_idx')
+        self.assertIndexScan(
+            self.ordered_query(self.url, {'pagination': 'cursor', 'ordering': 'title'}), 'blog_post_live_title_idx',
+        )
+
+    def test_author_feed_uses_index(self):
+        url = reverse('author-blog-posts-list', args=[self.author.id])
+        self.assertIndexScan(self.ordered_query(url), 'blog_post_live_author_idx')
+        self.assertIndexScan(self.ordered_query(url, {'ordering': 'date_created'}), 'blog_post_live_author_idx')
+
+
+class AsyncBlogPostReadTests(BlogAPITestCase):
+    ''' The async views answer exactly as the DRF views they stand in for.'''
+
+    def setUp(self):
+        super().setUp()
+        # the sync views authenticate with the same token as the async ones
+        self.client.force_authenticate(user=None)
+        self.factory = AsyncRequestFactory()
+        self.blogs = self.create_posts(12)
+        self.headers = {'Authorization': f'Bearer {self.author.tokens()["access"]}'}
+
+    async def get(self, view, path, data=None, **kwargs):
+        request = self.factory.get(path, data, headers={**self.headers, **kwargs.pop('headers', {})})
+        return await view(request, **kwargs)
+
+    def sync_get(self, path, data=None):
+        cache.clear()
+        return self.client.get(path, data, headers=self.headers)
+
+    async def test_detail_matches_sync_view(self):
+        url = reverse('blog-post-detail', args=[self.blogs[0].id])
+        response = await self.get(AsyncBlogPostDetails.as_view(), url, pk=self.blogs[0].id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        # rendered by the async view, not by DRF
+        self.assertNotIsInstance(response, Response)
+
+        expected = await sync_to_async(self.sync_get)(url)
+        self.assertEqual(json.loads(response.content), expected.json())
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    async def test_list_pages_match_sync_view(self):
+        url = reverse('blog-posts-list')
+        for page in ({}, {'page': 2}):
+            response = await self.get(AsyncBlogPostList.as_view(), url, page)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIsInstance(response, Response)
+            expected = await sync_to_async(self.sync_get)(url, page)
+            self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_cached_and_conditional_reads(self):
+        view, pk = AsyncBlogPostDetails.as_view(), self.blogs[0].id
+        url = reverse('blog-post-detail', args=[pk])
+        first = await self.get(view, url, pk=pk)
+        second = await self.get(view, url, pk=pk)
+        self.assertEqual(first.content, second.content)
+
+        response = await self.get(view, url, pk=pk, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_other_requests_fall_back_to_sync_view(self):
+        url = reverse('blog-posts-list')
+        response = await self.get(AsyncBlogPostList.as_view(), url, {'view': 'summary'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('body', response.data['results'][0])
+
+        # missing post and bad page: DRF's 404s
+        pk = self.blogs[-1].id + 100
+        response = await self.get(AsyncBlogPostDetails.as_view(), reverse('blog-post-detail', args=[pk]), pk=pk)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.get(AsyncBlogPostList.as_view(), url, {'page': 9})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_unauthenticated_read_is_rejected(self):
+        response = await self.get(
+            AsyncBlogPostList.as_view(), reverse('blog-posts-list'), headers={'Authorization': 'Bearer invalid'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_inactive_user_is_rejected(self):
+        self.author.is_active = False
+        await self.author.asave(update_fields=['is_active'])
+        response = await self.get(AsyncBlogPostList.as_view(), reverse('blog-posts-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 # TODO: 
 # tEST CREATE ENDPOINT
@@ -1,9 +1,20 @@
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# under ASGI, serve plain reads of posts on the event loop
+if settings.BLOG_ASYNC_READS:
+    post_list, post_detail = async_views.AsyncBlogPostList.as_view(), async_views.AsyncBlogPostDetails.as_view()
+else:
+    post_list, post_detail = views.BlogPostList.as_view(), views.BlogPostDetails.as_view()
 
 urlpatterns = [
-    path('blogs/', views.BlogPostList.as_view(), name='blog-posts-list'),
-    path('blogs/<int:pk>/', views.BlogPostDetails.as_view(), name='blog-post-detail'),
+    path('blogs/', post_list, name='blog-posts-list'),
+    path('blogs/<int:pk>/', post_detail, name='blog-post-detail'),
     path('blogs/blog/', views.BlogPostCreateView.as_view(), name='blog-post-create'),
+    path('blogs/search/', views.BlogPostSearch.as_view(), name='blog-posts-search'),
+    path('blogs/bulk/', views.BlogPostBulkView.as_view(), name='blog-posts-bulk'),
+    path('users/<int:author_id>/blogs/', views.AuthorBlogPostList.as_view(), name='author-blog-posts-list'),
+    path('blogs/cache/stats/', views.BlogCacheStats.as_view(), name='blog-cache-stats'),
 ]
@@ -1,25 +1,268 @@
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from vmbloggr.filters import StableOrderingFilter
 
 from .models import BlogPost
-from .serializers import BlogPostSerializer, BlogPostCreateSerializer
+from .filters import BlogPostFilter, BlogPostSearchFilter
+from .serializers import (
+    BlogPostSerializer, BlogPostSearchSerializer, BlogPostSummarySerializer, BlogPostCreateSerializer,
+    BlogPostBulkUpdateSerializer,
+)
 from .permissions import IsBlogPostAuthorOrReadOnly
+from . import caching, conditional
+from .pagination import BlogPostCursorPagination, use_cursor_pagination
 
 
+class CachedConditionalReadMixin:
+    ''' Serve GETs from the blog response cache and answer conditional requests.
+
+    Cache entries carry their ETag/Last-Modified validators, so a hit is
+    answered (200 or 304) without touching the database; on a miss the
+    validators are computed first and the body is only serialized when the
+    client's copy is stale.
+    '''
+
+    def cached_conditional_response(self, request, get_key, get_validators, get_response):
+        key = get_key() if caching.is_enabled() else None
+        entry = caching.fetch(key) if key else None
+        if entry is not None:
+            return conditional.respond(request, caching.entry_validators(entry), lambda: Response(entry['data']))
+
+        validators = get_validators()
+        if validators is None:
+            # nothing to validate against, let the view answer (e.g. with a 404)
+            return get_response()
+
+        def render():
+            response = get_response()
+            if key and response.status_code == 200:
+                caching.store(key, caching.entry(response.data, validators))
+            return response
+        return conditional.respond(request, validators, render)
+
+class ExpandAuthorMixin:
+    ''' `?expand=author` nests author summaries, joined in the same query.'''
+    author_fields = ['author__id', 'author__username']
+
+    def expand_author(self):
+        return 'author' in self.request.query_params.get('expand', '').split(',')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.expand_author():
+            queryset = queryset.select_related('author')
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand_author'] = self.expand_author()
+        return context
+
 class BlogPostCreateView(generics.CreateAPIView):
     serializer_class = BlogPostCreateSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        # assign by id so a stateless (token claims) request user works too
+        serializer.save(author_id=self.request.user.pk)
 
-class BlogPostList(generics.ListAPIView):
+class BlogPostList(CachedConditionalReadMixin, ExpandAuthorMixin, generics.ListAPIView):
     serializer_class = BlogPostSerializer
     queryset = BlogPost.objects.all()
     permission_classes = [IsAuthenticated,]
+    filter_backends = [DjangoFilterBackend, StableOrderingFilter]
+    filterset_class = BlogPostFilter
+    # each choice is served by one of the live-post indexes, in either direction
+    ordering_fields = ['date_created', 'title']
+    ordering = ('-date_created', '-id')
+    summary_fields = ['id', 'title', 'subtitle', 'author', 'date_created']
+    max_excerpt_length = 500
+
+    def is_summary(self):
+        return self.request.query_params.get('view') == 'summary'
+
+    def get_excerpt_length(self):
+        ''' Length of the body excerpt requested with `?excerpt=<n>`, capped; 0 when absent.'''
+        try:
+            length = int(self.request.query_params.get('excerpt', 0))
+        except ValueError:
+            return 0
+        return max(0, min(length, self.max_excerpt_length))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.is_summary():
+            # never read the body column; the database truncates it for the excerpt
+            fields = self.summary_fields + (self.author_fields if self.expand_author() else [])
+            queryset = queryset.only(*fields)
+            excerpt_length = self.get_excerpt_length()
+            if excerpt_length:
+                queryset = queryset.annotate(excerpt=Substr('body', 1, excerpt_length))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return BlogPostSummarySerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['with_excerpt'] = self.is_summary() and bool(self.get_excerpt_length())
+        return context
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_conditional_response(
+            request,
+            lambda: caching.list_key(request),
+            lambda: conditional.collection_validators(request),
+            lambda: super(BlogPostList, self).list(request, *args, **kwargs),
+        )
+
+    @property
+    def paginator(self):
+        ''' Swap in keyset pagination when the client opts into cursor mode.'''
+        if not hasattr(self, '_paginator') and use_cursor_pagination(self.request):
+            self._paginator = BlogPostCursorPagination()
+        return super().paginator
+
+class AuthorBlogPostList(BlogPostList):
+    ''' One author's posts, newest first: `/users/<author_id>/blogs/`.
+
+    Always keyset paginated, so every page is a range scan on the per-author
+    (author, date_created, id) index of live posts.
+    '''
+    pagination_class = BlogPostCursorPagination
+    ordering_fields = ['date_created']
+
+    def get_queryset(self):
+        return super().get_queryset().filter(author_id=self.kwargs['author_id'])
+
+class BlogPostSearch(ExpandAuthorMixin, generics.ListAPIView):
+    ''' Ranked full-text search over title, subtitle and body: `?q=<terms>`.
 
-class BlogPostDetails(generics.RetrieveUpdateDestroyAPIView):
+    Served from the database's full-text index (see blog.search) instead of
+    scanning the posts, best matches first.
+    '''
+    serializer_class = BlogPostSearchSerializer
+    queryset = BlogPost.objects.all()
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = BlogPostSearchFilter
+
+class BlogPostDetails(CachedConditionalReadMixin, ExpandAuthorMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BlogPostSerializer
     queryset = BlogPost.objects.all()
     permission_classes = [IsAuthenticated, IsBlogPostAuthorOrReadOnly]
 
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs['pk']
+        return self.cached_conditional_response(
+            request,
+            lambda: caching.detail_key(request, pk),
+            lambda: conditional.post_validators(request, self.get_queryset(), pk),
+            lambda: super(BlogPostDetails, self).retrieve(request, *args, **kwargs),
+        )
+
+    def perform_destroy(self, instance):
+        instance.soft_delete()
+
+class BlogPostBulkView(generics.GenericAPIView):
+    ''' Create (POST), update (PATCH) or delete (DELETE) many of the user's posts at once.
+
+    Each request is one transaction: a bulk INSERT, a bulk UPDATE or a single
+    soft-delete UPDATE, with author ownership checked for the whole batch in
+    one query. PATCH takes a list of `{"id": ..., <fields>}`, DELETE a list of ids.
+    '''
+    permission_classes = [IsAuthenticated]
+    serializer_class = BlogPostCreateSerializer
+
+    def check_batch(self, items):
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BLOG_BULK_MAX_BATCH:
+            return Response(
+                {"detail": f"At most {settings.BLOG_BULK_MAX_BATCH} posts per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    def check_ownership(self, ids, authors):
+        ''' Error response unless every id exists and belongs to the request user.'''
+        if len(set(ids)) != len(ids):
+            return Response({"detail": "Duplicate ids in the batch."}, status=status.HTTP_400_BAD_REQUEST)
+        missing = [pk for pk in ids if pk not in authors]
+        if missing:
+            return Response({"detail": "Blog posts not found.", "ids": missing}, status=status.HTTP_404_NOT_FOUND)
+        foreign = [pk for pk in ids if authors[pk] != self.request.user.pk]
+        if foreign:
+            return Response(
+                {"detail": "You can only change your own blog posts.", "ids": foreign},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+    def post(self, request):
+        error = self.check_batch(request.data)
+        if error:
+            return error
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        posts = serializer.save()
+        return Response(BlogPostSerializer(posts, many=True).data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request):
+        error = self.check_batch(request.data)
+        if error:
+            return error
+        serializer = BlogPostBulkUpdateSerializer(data=request.data, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        changes = {item.pop('id'): item for item in serializer.validated_data}
+
+        with transaction.atomic():
+            posts = BlogPost.objects.in_bulk(list(changes))
+            error = self.check_ownership(list(changes), {pk: post.author_id for pk, post in posts.items()})
+            if error:
+                return error
+            now = timezone.now()
+            fields = {'date_modified'}
+            for pk, item in changes.items():
+                for field, value in item.items():
+                    setattr(posts[pk], field, value)
+                    fields.add(field)
+                # bulk_update skips auto_now
+                posts[pk].date_modified = now
+            BlogPost.objects.bulk_update(posts.values(), sorted(fields))
+        # bulk_update sends no post_save
+        caching.invalidate_posts(*changes)
+        return Response(BlogPostSerializer(posts.values(), many=True).data)
+
+    def delete(self, request):
+        error = self.check_batch(request.data)
+        if error:
+            return error
+        ids = request.data
+        # JSON true/false are ints to isinstance()
+        if not all(type(pk) is int for pk in ids):
+            return Response({"detail": "Expected a list of blog post ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            authors = dict(BlogPost.objects.filter(pk__in=ids).values_list('pk', 'author_id'))
+            error = self.check_ownership(ids, authors)
+            if error:
+                return error
+            BlogPost.objects.delete_many(ids)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class BlogCacheStats(APIView):
+    ''' Hit/miss counters of this process's blog response cache.'''
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(caching.stats())
+
+
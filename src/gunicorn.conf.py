@@ -0,0 +1,28 @@
+''' gunicorn hooks, read from the working directory (src) by every gunicorn command.
+
+They keep the multiprocess Prometheus metrics (PROMETHEUS_MULTIPROC_DIR, see
+vmbloggr/metrics.py) consistent across worker restarts. The directory must
+exist and be emptied before the server starts, or the files of an earlier
+server's workers are added to this one's samples.
+'''
+import os
+
+
+workers_gauge = None
+
+
+def nworkers_changed(server, new_value, old_value):
+    global workers_gauge
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # created in the master only; importing vmbloggr.metrics here would add the master to the per-worker gauges
+        from prometheus_client import Gauge
+        if workers_gauge is None:
+            workers_gauge = Gauge('vmbloggr_gunicorn_workers', 'Workers the gunicorn master runs.', multiprocess_mode='max')
+        workers_gauge.set(new_value)
+
+
+def child_exit(server, worker):
+    # drops the exited worker's live gauges
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+
+from .models import User
+
+
+class UserRowCache:
+    ''' Small per-process cache of full user rows with a short time to live.'''
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        user = User.objects.get(pk=user_id)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_rows = UserRowCache(ttl=settings.JWT_USER_CACHE_TTL)
+
+
+class ClaimsUser(TokenUser):
+    ''' Request user built from the claims signed into the access token.
+
+    Tokens minted before the claims were added fall back to the full row.
+    '''
+
+    @cached_property
+    def username(self):
+        return self._claim('username')
+
+    @cached_property
+    def email(self):
+        return self._claim('email')
+
+    @cached_property
+    def is_active(self):
+        return self._claim('is_active')
+
+    @cached_property
+    def is_staff(self):
+        return self._claim('is_staff')
+
+    @cached_property
+    def is_superuser(self):
+        return self._claim('is_superuser')
+
+    def _claim(self, name):
+        if name in self.token:
+            return self.token[name]
+        return getattr(self.get_user(), name)
+
+    def get_user(self):
+        ''' The full users.User row, served from a short-lived in-process cache.'''
+        try:
+            return user_rows.get(self.id)
+        except User.DoesNotExist:
+            # as JWTAuthentication.get_user() does for a token outliving its user
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    ''' JWT authentication that trusts the signed claims instead of loading the user.
+
+    Enable it with JWT_STATELESS_AUTH=True. Claims are as fresh as the token,
+    i.e. a deactivated user keeps access until their access token expires.
+    '''
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,163 @@
+''' Per-process Bloom filter over the jtis of blacklisted refresh tokens.
+
+A token whose jti is not in the filter is certainly not blacklisted, so the
+refresh and logout paths skip the BlacklistedToken lookup entirely; only the
+(rare) possible hits fall back to the table.
+
+The filter is filled once from the table, kept current within this process by
+a post_save receiver and, for tokens blacklisted by other worker processes,
+by an incremental sync that runs at most every BLACKLIST_FILTER_SYNC_INTERVAL
+seconds. That interval is therefore how long a token blacklisted elsewhere may
+still be accepted here.
+
+The sync reads the rows past a watermark id. Ids are handed out on insert,
+not on commit, so a row can become visible after rows with higher ids; the
+watermark only moves past rows blacklisted BLACKLIST_FILTER_SYNC_OVERLAP
+seconds ago, and newer rows are read again until then.
+'''
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    ''' Fixed-size Bloom filter sized for `capacity` items at `error_rate` false positives.'''
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing: k positions from the two halves of a single digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def false_positive_rate(self):
+        ''' Expected false positive rate at the current fill.'''
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+    def stats(self):
+        return {
+            'capacity': self.capacity,
+            'items': self.count,
+            'bits': self.size,
+            'hash_functions': self.hash_count,
+            'memory_bytes': len(self.bits),
+            'target_false_positive_rate': self.error_rate,
+            'expected_false_positive_rate': self.false_positive_rate(),
+        }
+
+
+class BlacklistFilter:
+    ''' The process-wide blacklist filter and its synchronisation with the table.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bloom = None
+        self.watermark = 0
+        self.synced_at = 0.0
+        self.lookups = 0
+        self.skipped = 0
+
+    def warm(self):
+        ''' (Re)build the filter from the whole BlacklistedToken table.'''
+        count = BlacklistedToken.objects.count()
+        # leave headroom so the configured error rate holds as the table grows
+        bloom = BloomFilter(max(settings.BLACKLIST_FILTER_CAPACITY, 2 * count), settings.BLACKLIST_FILTER_ERROR_RATE)
+        watermark = self._add_rows(bloom, self._rows(BlacklistedToken.objects.all()))
+        with self._lock:
+            self.bloom, self.watermark, self.synced_at = bloom, watermark, time.monotonic()
+        logger.info('Blacklist filter warmed: %s', bloom.stats())
+
+    def _rows(self, queryset):
+        return queryset.order_by().values_list('id', 'token__jti', 'blacklisted_at').iterator(chunk_size=10000)
+
+    def _add_rows(self, bloom, rows):
+        ''' Add the jtis of rows to bloom; returns the id later syncs can start after.
+
+        That is the highest id of the rows blacklisted at least
+        BLACKLIST_FILTER_SYNC_OVERLAP seconds ago, kept below every newer row
+        so that rows still committing around them are not skipped.
+        '''
+        settled = timezone.now() - timedelta(seconds=settings.BLACKLIST_FILTER_SYNC_OVERLAP)
+        highest_settled, lowest_recent = 0, None
+        for pk, jti, blacklisted_at in rows:
+            # recent rows are read by several syncs, count them once
+            if jti not in bloom:
+                bloom.add(jti)
+            if blacklisted_at <= settled:
+                highest_settled = max(highest_settled, pk)
+            elif lowest_recent is None or pk < lowest_recent:
+                lowest_recent = pk
+        return highest_settled if lowest_recent is None else min(highest_settled, lowest_recent - 1)
+
+    def sync(self):
+        ''' Pick up tokens blacklisted since the last sync, by any process.'''
+        rows = list(self._rows(BlacklistedToken.objects.filter(id__gt=self.watermark)))
+        with self._lock:
+            # setting bits is read-modify-write, so the shared filter is only updated under the lock
+            self.watermark = max(self.watermark, self._add_rows(self.bloom, rows))
+            self.synced_at = time.monotonic()
+        if self.bloom.count > self.bloom.capacity:
+            self.warm()
+
+    def add(self, jti):
+        if self.bloom is not None:
+            with self._lock:
+                self.bloom.add(jti)
+
+    def might_contain(self, jti):
+        ''' False if jti is certainly not blacklisted, True if the table must be checked.'''
+        if self.bloom is None:
+            self.warm()
+        elif time.monotonic() - self.synced_at >= settings.BLACKLIST_FILTER_SYNC_INTERVAL:
+            self.sync()
+        hit = jti in self.bloom
+        with self._lock:
+            self.lookups += 1
+            self.skipped += not hit
+        return hit
+
+    def stats(self):
+        stats = self.bloom.stats() if self.bloom is not None else {}
+        stats.update({'lookups': self.lookups, 'database_lookups_skipped': self.skipped})
+        return stats
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def is_enabled():
+    return settings.BLACKLIST_FILTER_ENABLED
+
+
+def warm_blacklist_filter():
+    ''' Fill the filter at server start; on failure it is filled on first use instead.'''
+    if not is_enabled():
+        return
+    try:
+        blacklist_filter.warm()
+    except Exception:
+        logger.exception('Could not warm the blacklist filter')
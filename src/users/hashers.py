@@ -0,0 +1,17 @@
+''' Password hashing for process pools.
+
+Kept free of model imports so worker processes can import it before Django
+is set up.
+'''
+
+
+def init_worker():
+    import django
+
+    django.setup()
+
+
+def hash_passwords(passwords):
+    from django.contrib.auth.hashers import make_password
+
+    return [make_password(password) for password in passwords]
@@ -0,0 +1,137 @@
+''' Bulk user import shared by the batch signup endpoint and `manage.py import_users`.
+
+Rows are handled in chunks: each chunk is validated field by field, checked
+for clashes with existing users in one query, has its passwords hashed
+(optionally across a process pool; PBKDF2 dominates the cost) and is inserted
+with a single bulk_create. Invalid rows are reported without aborting the rest.
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .hashers import hash_passwords, init_worker
+from .models import User
+from .serializers import UserCreateSerializer
+
+
+class UserImportRowSerializer(UserCreateSerializer):
+    ''' Field validation of a single imported row; uniqueness is checked per chunk.'''
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        # as UserManager.create_user() does, before clashes are looked up
+        attrs['email'] = User.objects.normalize_email(attrs['email'])
+        attrs['username'] = User.normalize_username(attrs['username'])
+        return attrs
+
+    def validate_unique_fields(self, attrs):
+        pass
+
+
+class InvalidRow:
+    ''' A row a reader could not parse; reported with the rows that fail validation.'''
+
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def _chunks(rows, size):
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class UserImporter:
+    unique_fields = list(UserCreateSerializer.unique_field_messages)
+    unique_field_messages = UserCreateSerializer.unique_field_messages
+
+    def __init__(self, chunk_size=1000, workers=None):
+        self.chunk_size = chunk_size
+        self.workers = os.cpu_count() if workers is None else workers
+
+    def run(self, rows, progress=None):
+        ''' Import an iterable of user dicts (or InvalidRows); returns {'created': n, 'errors': [...]}.
+
+        Errors carry the 1-based position of the row in the input.
+        `progress` is called with the running result after each chunk.
+        '''
+        result = {'created': 0, 'errors': []}
+        pool = ProcessPoolExecutor(self.workers, initializer=init_worker) if self.workers > 1 else None
+        try:
+            for index, chunk in enumerate(_chunks(rows, self.chunk_size)):
+                self._import_chunk(list(enumerate(chunk, start=index * self.chunk_size + 1)), result, pool)
+                if progress:
+                    progress(result)
+        finally:
+            if pool:
+                pool.shutdown()
+        result['errors'].sort(key=lambda error: error['row'])
+        return result
+
+    def _import_chunk(self, numbered_rows, result, pool):
+        valid = []
+        for number, row in numbered_rows:
+            if isinstance(row, InvalidRow):
+                result['errors'].append({'row': number, 'errors': row.errors})
+                continue
+            serializer = UserImportRowSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                result['errors'].append({'row': number, 'errors': serializer.errors})
+
+        valid = self._drop_clashes(valid, result)
+        if not valid:
+            return
+
+        passwords = [data['password'] for _, data in valid]
+        if pool:
+            per_worker = -(-len(passwords) // self.workers)
+            hashed = [h for batch in pool.map(hash_passwords, _chunks(passwords, per_worker)) for h in batch]
+        else:
+            hashed = hash_passwords(passwords)
+
+        users = []
+        for (number, data), password in zip(valid, hashed):
+            users.append(User(**{**data, 'password': password}))
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            result['created'] += len(users)
+        except IntegrityError:
+            # a concurrent signup raced this chunk: fall back to row by row
+            for (number, _), user in zip(valid, users):
+                try:
+                    with transaction.atomic():
+                        user.save()
+                    result['created'] += 1
+                except IntegrityError:
+                    result['errors'].append({'row': number, 'errors': {'non_field_errors': ['User already exists.']}})
+
+    def _drop_clashes(self, valid, result):
+        ''' Remove rows clashing with existing users or with earlier rows, in one query.'''
+        lookups = Q()
+        for field in self.unique_fields:
+            lookups |= Q(**{f'{field}__in': [data[field] for _, data in valid]})
+        taken = {field: set() for field in self.unique_fields}
+        if valid:
+            for row in User.objects.filter(lookups).values_list(*self.unique_fields):
+                for field, value in zip(self.unique_fields, row):
+                    taken[field].add(value)
+
+        kept = []
+        for number, data in valid:
+            errors = {
+                field: [self.unique_field_messages[field]]
+                for field in self.unique_fields if data[field] in taken[field]
+            }
+            if errors:
+                result['errors'].append({'row': number, 'errors': errors})
+                continue
+            for field in self.unique_fields:
+                taken[field].add(data[field])
+            kept.append((number, data))
+        return kept
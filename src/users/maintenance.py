@@ -0,0 +1,77 @@
+''' Housekeeping for the simplejwt token blacklist tables.
+
+Every login and refresh inserts an OutstandingToken and every logout a
+BlacklistedToken; rows are useless once the token has expired, since an
+expired token is rejected before the blacklist is ever consulted.
+'''
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+logger = logging.getLogger(__name__)
+
+
+def prune_expired_tokens(batch_size=1000, now=None, progress=None):
+    ''' Delete expired outstanding tokens, and their blacklist entries, in batches.
+
+    Each batch is one short transaction, so the sweep never holds locks on the
+    whole table. `progress` is called with the running totals after each batch.
+    Returns the (outstanding, blacklisted) totals deleted.
+    '''
+    now = now or timezone.now()
+    # order_by() drops the model's default ordering so the expiry index drives the scan
+    expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by()
+    outstanding_total = blacklisted_total = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            # blacklist entries first, so deleting the tokens has nothing left to cascade to
+            blacklisted_total += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            deleted = OutstandingToken.objects.filter(pk__in=ids).delete()[1]
+            outstanding_total += deleted.get(OutstandingToken._meta.label, 0)
+        if progress:
+            progress(outstanding_total, blacklisted_total)
+    return outstanding_total, blacklisted_total
+
+
+class TokenPruner(threading.Thread):
+    ''' Daemon thread running prune_expired_tokens() every `interval` seconds.'''
+
+    def __init__(self, interval, batch_size=1000):
+        super().__init__(name='token-pruner', daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run(self):
+        from django.db import connection
+
+        while not self.stopped.wait(self.interval):
+            try:
+                outstanding, blacklisted = prune_expired_tokens(self.batch_size)
+                logger.info('Pruned %s expired tokens (%s blacklisted)', outstanding, blacklisted)
+            except Exception:
+                logger.exception('Pruning expired tokens failed')
+            finally:
+                connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_pruner = None
+
+
+def start_token_pruner():
+    ''' Start the in-process pruner if TOKEN_PRUNE_INTERVAL is set; safe to call repeatedly.'''
+    global _pruner
+    if settings.TOKEN_PRUNE_INTERVAL > 0 and _pruner is None:
+        _pruner = TokenPruner(settings.TOKEN_PRUNE_INTERVAL, settings.TOKEN_PRUNE_BATCH_SIZE)
+        _pruner.start()
+    return _pruner
@@ -0,0 +1,57 @@
+import csv
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importer import InvalidRow, UserImporter
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield InvalidRow({'non_field_errors': [f'Invalid JSON: {error}']})
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users from a CSV (with a header row) or JSON Lines file with '
+        'email, username, password and phone_number fields.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, streamed row by row.')
+        parser.add_argument('--format', choices=READERS, help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows validated and inserted together.')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Processes hashing passwords; 1 hashes in this process.',
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Unknown format {file_format!r}, pass --format csv or --format jsonl.')
+
+        def progress(result):
+            self.stdout.write(f"Imported {result['created']} users, {len(result['errors'])} rejected...")
+
+        importer = UserImporter(chunk_size=options['chunk_size'], workers=options['workers'])
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            result = importer.run(READERS[file_format](file), progress=progress)
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} users, {len(result['errors'])} rejected."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from users.maintenance import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWTs in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per transaction.')
+
+    def handle(self, *args, **options):
+        def progress(outstanding, blacklisted):
+            self.stdout.write(f'Pruned {outstanding} expired tokens ({blacklisted} blacklisted)...')
+
+        outstanding, blacklisted = prune_expired_tokens(options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned {outstanding} expired tokens ({blacklisted} blacklisted).'
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:10
+
+from django.db import migrations
+
+# the token_blacklist app is third party, so its expiry index is managed here;
+# jti (unique) and token_id (one-to-one) are already indexed by that app
+INDEX_NAME = 'token_blacklist_outstandingtoken_expires_at_idx'
+
+
+def create_expires_at_index(apps, schema_editor):
+    # build without blocking logins on large Postgres tables
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(
+        f'CREATE INDEX {concurrently}IF NOT EXISTS {INDEX_NAME} '
+        'ON token_blacklist_outstandingtoken (expires_at)'
+    )
+
+
+def drop_expires_at_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_expires_at_index, drop_expires_at_index),
+    ]
@@ -4,7 +4,7 @@ from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from datetime import date
 
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
 
 class User(AbstractUser):
     email = models.EmailField(_('email_address'), unique=True, db_index=True)
@@ -12,10 +12,22 @@ class User(AbstractUser):
 
     REQUIRED_FIELDS = ['first_name', 'last_name', 'phone_number']
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # unique index backing signup validation; accounts created without
+            # a phone number (e.g. superusers) are left out
+            models.UniqueConstraint(
+                fields=['phone_number'],
+                condition=~models.Q(phone_number=''),
+                name='users_user_phone_number_unique',
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.username
     
     def tokens(self):
+        ''' Mint a refresh/access token pair for this user.'''
         refresh = RefreshToken.for_user(self)
         return {
             'refresh': str(refresh),
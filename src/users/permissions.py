@@ -5,5 +5,6 @@ class IsUser(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
-        # Check if the user is the owner of the account
-        return obj.email == request.user.email
+        # Check if the user is the owner of the account; compare ids since a
+        # stateless request user only knows the email it had at login
+        return obj.pk == request.user.pk
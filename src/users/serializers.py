@@ -1,21 +1,33 @@
 from django.contrib import auth
-from rest_framework import serializers, validators
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import serializers as jwt_serializers
+from vmbloggr.serializers import TimedSerializerMixin
 from .models import User
+from .tokens import RefreshToken
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     "Serialiser for all HTTP methods related to the user except POST."
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'phone_number'] 
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     "Serialiser specific to creating a new user i.e. HTTP POST method."
 
     username = serializers.CharField(max_length=20, min_length=6)
     password = serializers.CharField(max_length=68, min_length=6, write_only=True)
+
+    # checked together in a single query by validate_unique_fields()
+    unique_field_messages = {
+        "email": "A user with that email already exists.",
+        "phone_number": "A user with that phone number already exists.",
+        "username": "A user with that username already exists.",
+    }
     
     class Meta:
         model = User
@@ -24,48 +36,51 @@ class UserCreateSerializer(serializers.ModelSerializer):
             "email": {
                 "required": True,
                 "allow_blank": False,
-                "validators": [
-                    validators.UniqueValidator(
-                        User.objects.all(), "A user with that email already exists."
-                    )
-                ]
+                # replaces the per-field UniqueValidator query
+                "validators": [],
             },
             "phone_number": {
                 "required": True,
                 "allow_blank": False,
-                "validators": [
-                    validators.UniqueValidator(
-                        User.objects.all(), "A user with that phone number already exists."
-                    )
-                ]
             },
-            "username": {
-                "required": True,
-                "allow_blank": False,
-                "validators": [
-                    validators.UniqueValidator(
-                        User.objects.all(), "A user with that username already exists."
-                    ),
-                ]
-            },   
         }
 
-    def create(self, validated_data):
-        return User.objects.create_user(**validated_data)
-
     def validate(self, attrs):
         email = attrs.get('email', '')
         username = attrs.get('username', '')
         if not username.isalnum():
             raise serializers.ValidationError(self.default_error_messages)
+        self.validate_unique_fields(attrs)
         return attrs
+
+    def validate_unique_fields(self, attrs):
+        ''' Check email, phone number and username against existing users with one OR'ed query.'''
+        fields = list(self.unique_field_messages)
+        lookups = Q()
+        for field in fields:
+            lookups |= Q(**{field: attrs[field]})
+
+        errors = {}
+        for row in User.objects.filter(lookups).values_list(*fields):
+            for field, value in zip(fields, row):
+                if value == attrs[field]:
+                    errors[field] = [self.unique_field_messages[field]]
+        if errors:
+            raise serializers.ValidationError(errors)
     
     def create(self, validated_data):
-        return User.objects.create_user(**validated_data)
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(**validated_data)
+        except IntegrityError:
+            # a concurrent signup took one of the values after validation;
+            # report it with the same field errors
+            self.validate_unique_fields(validated_data)
+            raise
 
 
 
-class LoginSerializer(serializers.ModelSerializer):
+class LoginSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     ''' Serialiser to handle the login endpoint.'''
     password = serializers.CharField(max_length=68, min_length=6,write_only=True)
     username = serializers.CharField(max_length=255, min_length=3)
@@ -76,11 +91,8 @@ class LoginSerializer(serializers.ModelSerializer):
         fields = ['password', 'username', 'tokens']
 
     def get_tokens(self, obj):
-        user = User.objects.get(username=obj['username'])
-        return {
-            'refresh': user.tokens()['refresh'],
-            'access': user.tokens()['access']
-        }
+        # minted once in validate(); each mint signs and stores an outstanding token
+        return obj['tokens']
     
     def validate(self, attrs):
         username = attrs.get('username','')
@@ -97,7 +109,20 @@ class LoginSerializer(serializers.ModelSerializer):
         return {
             'email': user.email,
             'username': user.username,
-            'tokens': user.tokens
+            'tokens': user.tokens()
         }
 
 
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    ''' Serialiser for the token endpoint, minting tokens that carry the user claims.'''
+    token_class = RefreshToken
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    ''' Serialiser for the refresh endpoint; blacklist checks go through the filter.'''
+    token_class = RefreshToken
+
+
+class TokenBlacklistSerializer(jwt_serializers.TokenBlacklistSerializer):
+    ''' Serialiser for the logout endpoint; blacklist checks go through the filter.'''
+    token_class = RefreshToken
@@ -1,8 +1,28 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from rest_framework.views import APIView
 from rest_framework.test import APIClient
 from rest_framework import status
 from users.models import User  
 from django.urls import reverse
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from blog.models import BlogPost
+from users.serializers import UserCreateSerializer
+from users.blacklist import BloomFilter, blacklist_filter
+from users.maintenance import prune_expired_tokens
+from users.authentication import ClaimsUser, StatelessJWTAuthentication, user_rows
+from vmbloggr.testing import QueryPlanAssertionsMixin
 
 
 class UserCreateViewTest(TestCase):
@@ -47,6 +67,47 @@ class UserCreateViewTest(TestCase):
         response = self.client.post('/api/users/user/', self.valid_user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_create_user_existing_username(self):
+        User.objects.create_user(username=self.valid_user_data['username'], password="password", email="ab@gmail.com")
+
+        response = self.client.post('/api/users/user/', self.valid_user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['username'], ["A user with that username already exists."])
+
+    def test_create_user_reports_every_clashing_field(self):
+        User.objects.create_user(username="existinguser", password="password", email=self.valid_user_data['email'])
+        User.objects.create_user(
+            username="otheruser", password="password", email="ab@gmail.com", phone_number=self.valid_user_data['phone_number']
+        )
+
+        response = self.client.post('/api/users/user/', self.valid_user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'email', 'phone_number'})
+
+    def test_create_user_checks_uniqueness_in_one_query(self):
+        # one uniqueness query, then the insert inside its savepoint
+        with self.assertNumQueries(4):
+            response = self.client.post('/api/users/user/', self.valid_user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_create_user_concurrent_duplicate_maps_to_field_error(self):
+        # another signup took the phone number after validation had passed
+        User.objects.create_user(
+            username="raceuser", password="password", email="race@gmail.com", phone_number=self.valid_user_data['phone_number']
+        )
+        original = UserCreateSerializer.validate_unique_fields
+        calls = []
+
+        def validate_after_race(serializer, attrs):
+            calls.append(attrs)
+            if len(calls) > 1:
+                original(serializer, attrs)
+
+        with mock.patch.object(UserCreateSerializer, 'validate_unique_fields', validate_after_race):
+            response = self.client.post('/api/users/user/', self.valid_user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['phone_number'], ["A user with that phone number already exists."])
+
 
 class UserViewSetTest(TestCase):
     def setUp(self):
@@ -128,6 +189,32 @@ class UserViewSetTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class UserListOrderingTest(QueryPlanAssertionsMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for username, phone_number in (('carol', '+2341'), ('alice', '+2342'), ('bob', '+2343')):
+            User.objects.create(username=username, email=f'{username}@gmail.com', phone_number=phone_number)
+        self.client.force_authenticate(user=User.objects.get(username='alice'))
+
+    def usernames(self, **params):
+        response = self.client.get('/api/users/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['username'] for user in response.data['results']]
+
+    def test_default_ordering(self):
+        self.assertEqual(self.usernames(), ['alice', 'bob', 'carol'])
+
+    def test_ordering_by_username_descending(self):
+        self.assertEqual(self.usernames(ordering='-username'), ['carol', 'bob', 'alice'])
+
+    def test_ordering_ignores_fields_not_whitelisted(self):
+        self.assertEqual(self.usernames(ordering='email'), ['alice', 'bob', 'carol'])
+
+    def test_list_uses_username_index(self):
+        self.assertIndexScan(self.ordered_query('/api/users/'))
+        self.assertIndexScan(self.ordered_query('/api/users/', {'ordering': '-username'}))
+
+
 class LoginAPIViewTest(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -154,3 +241,291 @@ class LoginAPIViewTest(TestCase):
         url = reverse('token_obtain_pair')
         response = self.client.post(url, self.invalid_user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_endpoint_returns_tokens(self):
+        url = reverse('login')
+        response = self.client.post(url, self.user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data['tokens'])
+        self.assertIn('refresh', response.data['tokens'])
+
+    def test_login_endpoint_mints_single_token_pair(self):
+        url = reverse('login')
+        # one user lookup, one outstanding token insert
+        with self.assertNumQueries(2):
+            response = self.client.post(url, self.user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        outstanding = OutstandingToken.objects.get(user=self.user)
+        self.assertEqual(outstanding.token, response.data['tokens']['refresh'])
+
+    def test_login_endpoint_invalid_credentials(self):
+        url = reverse('login')
+        response = self.client.post(url, self.invalid_user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+
+@mock.patch.object(APIView, 'authentication_classes', [StatelessJWTAuthentication])
+class StatelessJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_rows.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email='er@gmail.com', phone_number='+23407045795721'
+        )
+        self.access = self.user.tokens()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_token_carries_user_claims(self):
+        token = AccessToken(self.access)
+        self.assertEqual(token['username'], "testuser")
+        self.assertEqual(token['email'], 'er@gmail.com')
+        self.assertTrue(token['is_active'])
+
+    def test_token_endpoint_carries_user_claims(self):
+        url = reverse('token_obtain_pair')
+        response = self.client.post(url, {"username": "testuser", "password": "testpassword"}, format='json')
+        self.assertEqual(AccessToken(response.data['access'])['email'], 'er@gmail.com')
+
+    def test_authenticated_request_skips_user_query(self):
+        # count, page; no users row is read
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/users/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stateless_user_can_write_own_resources(self):
+        response = self.client.post(
+            reverse('blog-post-create'), {'title': 'Title', 'subtitle': 'Subtitle', 'body': 'Body'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        blog = BlogPost.objects.get()
+        self.assertEqual(blog.author_id, self.user.id)
+
+        response = self.client.patch(reverse('blog-post-detail', args=[blog.id]), {'body': 'New'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(f'/api/users/{self.user.id}/', {'email': 'new@gmail.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_inactive_claim_rejected(self):
+        token = AccessToken(self.access)
+        token['is_active'] = False
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.client.get('/api/users/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_user_row_is_cached(self):
+        user = ClaimsUser(AccessToken(self.access))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.get_user(), self.user)
+            self.assertEqual(user.get_user(), self.user)
+
+    def test_token_without_claims_falls_back_to_user_row(self):
+        token = AccessToken.for_user(self.user)
+        user = ClaimsUser(token)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'er@gmail.com')
+
+    def test_token_of_deleted_user_rejected(self):
+        # without claims, authentication falls back to the deleted row
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.user.delete()
+        response = self.client.get('/api/users/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['code'], 'user_not_found')
+
+
+class PruneTokensTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        now = timezone.now()
+        for i in range(3):
+            expired = OutstandingToken.objects.create(
+                user=self.user, jti=f'expired-{i}', token='token', expires_at=now - timedelta(hours=1)
+            )
+        BlacklistedToken.objects.create(token=expired)
+        self.live = OutstandingToken.objects.create(
+            user=self.user, jti='live', token='token', expires_at=now + timedelta(hours=1)
+        )
+        BlacklistedToken.objects.create(token=self.live)
+
+    def test_prune_expired_tokens(self):
+        progress = []
+        totals = prune_expired_tokens(batch_size=2, progress=lambda *totals: progress.append(totals))
+
+        self.assertEqual(totals, (3, 1))
+        self.assertEqual(progress, [(2, 0), (3, 1)])
+        # live tokens, and their blacklist entries, are kept
+        self.assertEqual(list(OutstandingToken.objects.all()), [self.live])
+        self.assertEqual(BlacklistedToken.objects.get().token, self.live)
+
+    def test_prune_tokens_command(self):
+        out = StringIO()
+        call_command('prune_tokens', batch_size=10, stdout=out)
+        self.assertIn('Pruned 3 expired tokens (1 blacklisted).', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+
+
+class BloomFilterTest(TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate_near_target(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.03)
+        self.assertAlmostEqual(bloom.stats()['expected_false_positive_rate'], 0.01, delta=0.005)
+
+
+@override_settings(BLACKLIST_FILTER_ENABLED=True, BLACKLIST_FILTER_SYNC_INTERVAL=3600)
+class BlacklistFilterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.refresh = self.user.tokens()['refresh']
+        blacklist_filter.warm()
+
+    def test_refresh_skips_blacklist_query(self):
+        url = reverse('token_refresh')
+        # nothing but the signature is checked for a jti the filter has never seen
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logged_out_token_is_rejected(self):
+        response = self.client.post(reverse('token_blacklist'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_blacklisted_elsewhere_is_picked_up_by_sync(self):
+        # blacklisted by another process: no signal reaches this filter
+        outstanding = OutstandingToken.objects.get(token=self.refresh)
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+
+        with override_settings(BLACKLIST_FILTER_SYNC_INTERVAL=0):
+            response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_committed_after_a_higher_id_is_picked_up_by_sync(self):
+        other = OutstandingToken.objects.get(token=self.user.tokens()['refresh'])
+        outstanding = OutstandingToken.objects.get(token=self.refresh)
+        # the row with the lower id is inserted first, but commits after the next sync
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(id=100, token=other)])
+        blacklist_filter.sync()
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(id=50, token=outstanding)])
+
+        with override_settings(BLACKLIST_FILTER_SYNC_INTERVAL=0):
+            response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # once the rows are older than the overlap, later syncs start after them
+        BlacklistedToken.objects.update(blacklisted_at=timezone.now() - timedelta(minutes=5))
+        blacklist_filter.sync()
+        self.assertEqual(blacklist_filter.watermark, 100)
+
+    def test_stats_restricted_to_admin(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('token_blacklist_stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('memory_bytes', response.data)
+        self.assertIn('expected_false_positive_rate', response.data)
+
+
+class UserBulkImportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username="adminuser", password="password", is_staff=True)
+        User.objects.create_user(
+            username="existinguser", password="password", email='taken@gmail.com', phone_number='+23407000000001'
+        )
+        self.rows = [
+            {'username': 'newuser1', 'password': 'password1', 'email': 'new1@gmail.com', 'phone_number': '+23407000000011'},
+            {'username': 'newuser2', 'password': 'password2', 'email': 'taken@gmail.com', 'phone_number': '+23407000000012'},
+            {'username': 'bad', 'password': 'password3', 'email': 'new3@gmail.com', 'phone_number': '+23407000000013'},
+            {'username': 'newuser4', 'password': 'password4', 'email': 'new4@gmail.com', 'phone_number': '+23407000000011'},
+            {'username': 'newuser5', 'password': 'password5', 'email': 'new5@gmail.com', 'phone_number': '+23407000000015'},
+        ]
+
+    def test_bulk_create_reports_rejected_rows(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(reverse('signup-bulk'), self.rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 2)
+
+        # clashes with an existing user, a field error and a duplicate within the batch
+        errors = {error['row']: set(error['errors']) for error in response.data['errors']}
+        self.assertEqual(errors, {2: {'email'}, 3: {'username'}, 4: {'phone_number'}})
+
+        user = User.objects.get(username='newuser5')
+        self.assertTrue(user.check_password('password5'))
+
+    def test_bulk_create_normalizes_like_signup(self):
+        self.client.force_authenticate(user=self.admin)
+        rows = [
+            {'username': 'ｎｅｗｕｓｅｒ６', 'password': 'password6', 'email': 'new6@GMAIL.com', 'phone_number': '+23407000000016'},
+            {'username': 'newuser7', 'password': 'password7', 'email': 'taken@GMAIL.COM', 'phone_number': '+23407000000017'},
+        ]
+        response = self.client.post(reverse('signup-bulk'), rows, format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(User.objects.get(username='newuser6').email, 'new6@gmail.com')
+
+    def test_bulk_create_batch_size_capped(self):
+        self.client.force_authenticate(user=self.admin)
+        with self.settings(USER_IMPORT_MAX_BATCH=2):
+            response = self.client.post(reverse('signup-bulk'), self.rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_query_count(self):
+        self.client.force_authenticate(user=self.admin)
+        rows = [self.rows[0], self.rows[4]]
+        # one clash query and one insert (in its savepoint), whatever the batch size
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('signup-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_create_restricted_to_admin(self):
+        self.client.force_authenticate(user=User.objects.get(username="existinguser"))
+        response = self.client.post(reverse('signup-bulk'), self.rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_users_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as file:
+            for row in self.rows:
+                file.write(json.dumps(row) + '\n')
+        self.addCleanup(os.remove, file.name)
+
+        out, err = StringIO(), StringIO()
+        call_command('import_users', file.name, chunk_size=2, workers=2, stdout=out, stderr=err)
+
+        self.assertIn('Imported 2 users, 3 rejected.', out.getvalue())
+        self.assertIn('Row 2:', err.getvalue())
+        self.assertTrue(User.objects.get(username='newuser1').check_password('password1'))
+
+    def test_import_users_command_reports_malformed_lines(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as file:
+            file.write(json.dumps(self.rows[0]) + '\n')
+            file.write('{"username": "newuser2",\n')
+            file.write(json.dumps(self.rows[4]) + '\n')
+        self.addCleanup(os.remove, file.name)
+
+        out, err = StringIO(), StringIO()
+        call_command('import_users', file.name, chunk_size=1, workers=1, stdout=out, stderr=err)
+
+        self.assertIn('Imported 2 users, 1 rejected.', out.getvalue())
+        self.assertIn('Row 2: {"non_field_errors": ["Invalid JSON:', err.getvalue())
+        self.assertTrue(User.objects.filter(username='newuser5').exists())
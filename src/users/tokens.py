@@ -0,0 +1,47 @@
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+
+from . import blacklist
+
+# user attributes signed into every token, enough for StatelessJWTAuthentication
+# to build the request user without reading the users table
+USER_CLAIMS = ('username', 'email', 'is_active', 'is_staff', 'is_superuser')
+
+
+class UserClaimsToken(tokens.Token):
+    ''' Embed USER_CLAIMS when a token is minted for a user.'''
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class RefreshToken(tokens.RefreshToken, UserClaimsToken):
+    ''' Refresh token carrying the user claims and signed at most once.
+
+    UserClaimsToken sits between simplejwt's BlacklistMixin and Token in the
+    MRO, so the claims are set before the token is stored as outstanding and
+    the access token derived from it inherits them.
+
+    simplejwt signs a freshly minted refresh token once to store it as an
+    outstanding token and again when it is handed to the client; the signed
+    string is reused as long as the payload has not changed since.
+
+    Blacklist checks consult the in-process Bloom filter first when
+    BLACKLIST_FILTER_ENABLED is set.
+    '''
+    _encoded = None
+
+    def __str__(self):
+        if self._encoded is None or self._encoded[0] != self.payload:
+            self._encoded = (dict(self.payload), super().__str__())
+        return self._encoded[1]
+
+    def check_blacklist(self):
+        # a jti the filter has never seen cannot be blacklisted
+        if blacklist.is_enabled() and not blacklist.blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            return
+        super().check_blacklist()
@@ -14,9 +14,11 @@ router.register(r'users', UserViewSet)
 
 urlpatterns = [
     path('users/user/', views.UserCreateView.as_view(), name="signup"),
+    path('users/bulk/', views.UserBulkCreateView.as_view(), name="signup-bulk"),
     path('login/', views.LoginAPIView.as_view(), name="login"),
     path('', include(router.urls)),
     path('logout/', TokenBlacklistView.as_view(), name="token_blacklist"),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/blacklist/stats/', views.BlacklistFilterStatsView.as_view(), name='token_blacklist_stats'),
 ]
\ No newline at end of file
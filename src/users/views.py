@@ -1,11 +1,16 @@
+from django.conf import settings
 from django.shortcuts import render
 from rest_framework import generics, status, permissions, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
+from vmbloggr.filters import StableOrderingFilter
+
 from .models import User
 from .serializers import LoginSerializer, UserSerializer, UserCreateSerializer
 from .permissions import IsUser
+from .blacklist import blacklist_filter
+from .importer import UserImporter
 from . import utils 
 
 
@@ -22,10 +27,35 @@ class UserCreateView(generics.GenericAPIView):
         return Response(user_data, status=status.HTTP_201_CREATED)
 
 
+class UserBulkCreateView(generics.GenericAPIView):
+    ''' Create a batch of users from a list, e.g. when migrating a partner's userbase.
+
+    Valid rows are created even when others are rejected; the response lists
+    the rejected rows (1-based) with their errors.
+    '''
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of users."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.USER_IMPORT_MAX_BATCH:
+            return Response(
+                {"detail": f"At most {settings.USER_IMPORT_MAX_BATCH} users per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        result = UserImporter(workers=settings.USER_IMPORT_API_WORKERS).run(rows)
+        return Response(result, status=status.HTTP_207_MULTI_STATUS if result['errors'] else status.HTTP_201_CREATED)
+
+
 class UserViewSet(utils.ListRetrieveUpdateDestroyViewSet):
     '''List all users, retrieve, update or delete a single user.'''
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    filter_backends = [StableOrderingFilter]
+    # username is unique, so its index alone gives a stable order
+    ordering_fields = ['username']
+    ordering = ('username',)
     
     def get_permissions(self):
         if self.action in ('destroy', 'update', 'partial_update') :
@@ -39,7 +69,7 @@ class UserViewSet(utils.ListRetrieveUpdateDestroyViewSet):
         '''Delete a user. Only a user can delete their account.'''
         instance = self.get_object()
 
-        if instance.email != request.user.email:
+        if instance.pk != request.user.pk:
             return Response(
                 {"detail": "You don't have permission to delete this account."},
                 status=status.HTTP_403_FORBIDDEN,
@@ -59,6 +89,14 @@ class LoginAPIView(generics.GenericAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class BlacklistFilterStatsView(generics.GenericAPIView):
+    ''' Size, fill and false positive rate of this process's blacklist filter.'''
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(blacklist_filter.stats())
+
+
 # Home page
 def index_view(request):
     context = {"title": "vmbloggr API"}
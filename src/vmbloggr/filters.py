@@ -0,0 +1,25 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.filters import OrderingFilter
+
+
+class StableOrderingFilter(OrderingFilter):
+    ''' `?ordering=` over the view's whitelisted `ordering_fields`, with a primary key tie-breaker.
+
+    Unless one of the ordering fields is unique, the primary key is appended
+    in the direction of the last field, so rows sharing a value keep their
+    place between pages and an index on (field, id) serves both directions.
+    '''
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or any(self.is_unique(queryset.model, field.lstrip('-')) for field in ordering):
+            return ordering
+        return [*ordering, '-pk' if ordering[-1].startswith('-') else 'pk']
+
+    def is_unique(self, model, name):
+        if name == 'pk':
+            return True
+        try:
+            return model._meta.get_field(name).unique
+        except FieldDoesNotExist:
+            return False
@@ -0,0 +1,76 @@
+''' Prometheus metrics, served at /metrics with METRICS_ENABLED.
+
+MetricsMiddleware records every request: a counter by route, method and
+status, latency and database query histograms by route, and per-worker
+gauges. The gunicorn master reports its number of workers (gunicorn.conf.py).
+The blog response cache counts its lookups by result, so the hit ratio is
+`rate(vmbloggr_blog_cache_lookups_total{result="hit"}[5m])` over the rate
+of all lookups.
+
+Under gunicorn every worker is its own process. With PROMETHEUS_MULTIPROC_DIR
+set (see server-entrypoint.sh and gunicorn.conf.py), the workers write their
+samples to files in that directory and /metrics adds them up, whichever
+worker serves it; without it each process reports only its own samples.
+'''
+import os
+import resource
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+REQUESTS = Counter(
+    'vmbloggr_http_requests_total', 'HTTP requests by route, method and status.', ['route', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'vmbloggr_http_request_duration_seconds', 'HTTP request latency by route.', ['route', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    'vmbloggr_http_request_db_queries', 'Database queries per HTTP request by route.', ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+CACHE_LOOKUPS = Counter('vmbloggr_blog_cache_lookups_total', 'Blog response cache lookups by result.', ['result'])
+
+# one sample per live worker process, labelled with its pid
+IN_PROGRESS = Gauge(
+    'vmbloggr_worker_requests_in_progress', 'Requests a worker is serving.', multiprocess_mode='liveall',
+)
+MAX_RSS = Gauge(
+    'vmbloggr_worker_max_rss_bytes', 'Peak resident memory of a worker.', multiprocess_mode='liveall',
+)
+
+
+def route(request):
+    ''' The URL pattern request matched, so that e.g. every post detail shares one label.'''
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+def observe(request, response, duration, queries):
+    label = route(request)
+    REQUESTS.labels(label, request.method, response.status_code).inc()
+    LATENCY.labels(label, request.method).observe(duration)
+    DB_QUERIES.labels(label).observe(queries)
+    # ru_maxrss is in kilobytes on Linux
+    MAX_RSS.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+def record_cache_lookup(hit):
+    CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+
+def registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return collected
+    return REGISTRY
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,163 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, queries, routers, timing
+
+timing_logger = logging.getLogger('vmbloggr.timing')
+
+
+class ReplicaRoutingMiddleware:
+    ''' Let vmbloggr.routers send this request's reads to a replica until it writes.'''
+    # async too, so ASGI requests are not handed to a thread just to pass through
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routers.routing(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with routers.routing(request):
+            return await self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    ''' Report the wall, SQL, serialization and rendering time of a sample of requests.
+
+    Sampled responses carry a Server-Timing header and are logged as one JSON
+    line on `vmbloggr.timing`; see vmbloggr.timing. Other requests pay for the
+    sampling decision and a context variable lookup per query; with a sample
+    rate of 0 the middleware is not loaded and nothing is hooked.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.REQUEST_TIMING_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        timing.enable()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return random.random() < settings.REQUEST_TIMING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        timing.install_query_recorders()
+        with timing.measure() as metrics:
+            response = self.get_response(request)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        # the ORM runs the queries on the thread sync_to_async hands this request's sync work to
+        await sync_to_async(timing.install_query_recorders)()
+        with timing.measure() as metrics:
+            response = await self.get_response(request)
+        return self.report(request, response, metrics)
+
+    def report(self, request, response, metrics):
+        total = metrics.elapsed() * 1000
+        db, render = metrics.db_time * 1000, metrics.render_time * 1000
+        serialize = metrics.serialize_time * 1000
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db:.1f};desc="{metrics.queries} queries"',
+            f'serialize;dur={serialize:.1f}',
+            f'render;dur={render:.1f}',
+            f'total;dur={total:.1f}',
+        ])
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total, 2),
+            'db_queries': metrics.queries,
+            'db_ms': round(db, 2),
+            'serialize_ms': round(serialize, 2),
+            'render_ms': round(render, 2),
+            # streamed bodies are not buffered to measure them
+            'response_bytes': None if response.streaming else len(response.content),
+        }
+        timing_logger.info(json.dumps(fields), extra={'request_timing': fields})
+        return response
+
+
+class MetricsMiddleware:
+    ''' Record every request in the Prometheus metrics of vmbloggr.metrics.'''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        timing.enable()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        timing.install_query_recorders()
+        with metrics.IN_PROGRESS.track_inprogress(), timing.measure() as measured:
+            response = self.get_response(request)
+        metrics.observe(request, response, time.perf_counter() - start, measured.queries)
+        return response
+
+    async def __acall__(self, request):
+        # connections of the threads running the queries get the recorder when they connect
+        start = time.perf_counter()
+        with metrics.IN_PROGRESS.track_inprogress(), timing.measure() as measured:
+            response = await self.get_response(request)
+        metrics.observe(request, response, time.perf_counter() - start, measured.queries)
+        return response
+
+
+class QueryInspectorMiddleware:
+    ''' Flag the repeated and slow queries of each request; see vmbloggr.queries.'''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            raise MiddlewareNotUsed
+        queries.enable()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries.install_query_inspectors()
+        with queries.inspecting() as inspection:
+            response = self.get_response(request)
+        queries.report(request, inspection)
+        return response
+
+    async def __acall__(self, request):
+        await sync_to_async(queries.install_query_inspectors)()
+        with queries.inspecting() as inspection:
+            response = await self.get_response(request)
+        queries.report(request, inspection)
+        return response
@@ -0,0 +1,121 @@
+''' Page number pagination that does not run an exact COUNT(*) on large tables.
+
+Counting every row costs more than fetching a page once a table holds
+millions of rows, so above PAGINATION_COUNT_ESTIMATE_THRESHOLD rows the
+total is taken from PostgreSQL's statistics instead: pg_class.reltuples for
+a whole table, the planner's EXPLAIN estimate for a filtered queryset.
+Smaller results, and other databases, are counted exactly.
+
+With PAGINATION_COUNT_CACHE_TIMEOUT set, totals are also cached for that
+many seconds. Responses carry `count_is_approximate`, true for estimated
+and cached totals.
+'''
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset):
+    ''' PostgreSQL's estimate of the rows in queryset, or None on other databases.'''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            # reltuples is -1 until the table is first vacuumed or analyzed
+            if row is not None and row[0] >= 0:
+                return int(row[0])
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _count_key(queryset):
+    # the rows counted do not depend on the ordering or the selected columns
+    sql = str(queryset.order_by().values('pk').query)
+    return 'pagination:count:%s' % hashlib.md5(sql.encode()).hexdigest()
+
+
+def count_rows(queryset):
+    ''' (count, is_approximate) of queryset.'''
+    key = _count_key(queryset)
+    timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+    result = cache.get(key) if timeout else None
+    if result is not None:
+        # a cached total may be out of date by up to the timeout
+        result = (result[0], True)
+    else:
+        estimate = estimate_count(queryset)
+        if estimate is not None and estimate >= settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+            result = (estimate, True)
+        else:
+            result = (queryset.count(), False)
+        if timeout:
+            cache.set(key, result, timeout)
+    return result
+
+
+class CountEstimatePaginator(Paginator):
+    ''' Django paginator taking its total from count_rows().
+
+    An estimate can be short of the real total, so pages past the estimated
+    last page are still served (empty once the rows run out) and no page is
+    cut short to fit the estimate.
+    '''
+    count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return len(self.object_list)
+        count, self.count_is_approximate = count_rows(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.count_is_approximate and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+class ApproximateCountPagination(PageNumberPagination):
+    ''' PageNumberPagination over CountEstimatePaginator, flagging estimated totals.'''
+    django_paginator_class = CountEstimatePaginator
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_approximate', self.page.paginator.count_is_approximate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_approximate'] = {'type': 'boolean', 'example': False}
+        return response_schema
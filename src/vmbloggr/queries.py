@@ -0,0 +1,152 @@
+''' Development aid flagging N+1 query patterns and slow queries per request.
+
+With QUERY_INSPECTOR_ENABLED=True, QueryInspectorMiddleware groups the
+queries of each request by their SQL with the values taken out, so one
+statement repeated per row of a list (e.g. loading `post.author` in a loop)
+shows up as a single pattern run many times. Patterns run at least
+QUERY_INSPECTOR_REPEAT_THRESHOLD times are logged on `vmbloggr.queries`
+with the project code line that issued them first, and raise
+RepeatedQueriesError with QUERY_INSPECTOR_RAISE=True, e.g. in tests.
+
+Queries taking at least QUERY_INSPECTOR_SLOW_MS are logged with the
+database's EXPLAIN of them.
+
+It runs an extra EXPLAIN per slow query and walks the stack once per
+pattern, so keep it out of production. With the setting off, the middleware
+is never loaded and no connection gets the execute wrapper.
+'''
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+_inspection = ContextVar('query_inspection', default=None)
+
+# string and number literals, runs of placeholders ("IN (%s, %s, ...)"), whitespace
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RUNS = re.compile(r'(?:%s|\?)(?:\s*,\s*(?:%s|\?))+')
+_WHITESPACE = re.compile(r'\s+')
+
+# statements EXPLAIN can describe without running them
+_EXPLAINED = ('SELECT', 'WITH')
+
+
+class RepeatedQueriesError(Exception):
+    pass
+
+
+def normalize(sql):
+    ''' sql with its values replaced, so that runs differing only in values compare equal.'''
+    sql = _LITERALS.sub('?', sql)
+    sql = _PLACEHOLDER_RUNS.sub('?, ...', sql.replace('%s', '?'))
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def caller():
+    ''' "file:line in function" of the innermost project frame outside the query hooks.'''
+    base_dir = str(settings.BASE_DIR)
+    # the execute wrappers of this module and vmbloggr.timing
+    hooks = {__file__, timing.__file__}
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename \
+                and frame.filename not in hooks:
+            return f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class Inspection:
+    ''' Queries of one request, grouped by normalized SQL.'''
+
+    def __init__(self):
+        self.counts = Counter()
+        self.callers = {}
+        self.explaining = False
+
+    def record(self, sql):
+        pattern = normalize(sql)
+        self.counts[pattern] += 1
+        if pattern not in self.callers:
+            self.callers[pattern] = caller()
+
+    def repeated(self):
+        threshold = settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+        return [(pattern, count) for pattern, count in self.counts.most_common() if count >= threshold]
+
+
+@contextmanager
+def inspecting():
+    inspection = Inspection()
+    token = _inspection.set(inspection)
+    try:
+        yield inspection
+    finally:
+        _inspection.reset(token)
+
+
+def explain(connection, sql, params):
+    # in a savepoint: on PostgreSQL a failed EXPLAIN would abort the request's own transaction
+    with transaction.atomic(using=connection.alias, savepoint=True), connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def inspect_query(execute, sql, params, many, context):
+    inspection = _inspection.get()
+    if inspection is None or inspection.explaining:
+        return execute(sql, params, many, context)
+    inspection.record(sql)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - start) * 1000
+    if duration >= settings.QUERY_INSPECTOR_SLOW_MS and not many and sql.lstrip()[:6].upper().startswith(_EXPLAINED):
+        inspection.explaining = True
+        try:
+            plan = explain(context['connection'], sql, params)
+        except DatabaseError as error:
+            plan = f'(EXPLAIN failed: {error})'
+        finally:
+            inspection.explaining = False
+        logger.warning('Slow query (%.1f ms) from %s:\n%s\n%s', duration, caller(), sql, plan)
+    return result
+
+
+def install_query_inspector(connection, **kwargs):
+    # first in the list, so execute_wrapper() blocks entered earlier still pop their own wrapper
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, inspect_query)
+
+
+def install_query_inspectors():
+    for connection in connections.all(initialized_only=True):
+        install_query_inspector(connection)
+
+
+def enable():
+    ''' Give every connection opened from now on the inspector; connections stay untouched until then.'''
+    connection_created.connect(install_query_inspector, dispatch_uid='vmbloggr.queries.install_query_inspector')
+
+
+def report(request, inspection):
+    ''' Log the request's repeated query patterns; raise for them with QUERY_INSPECTOR_RAISE.'''
+    repeated = inspection.repeated()
+    for pattern, count in repeated:
+        logger.warning(
+            'Possible N+1 in %s %s: %s runs of a query from %s:\n%s',
+            request.method, request.path, count, inspection.callers[pattern], pattern,
+        )
+    if repeated and settings.QUERY_INSPECTOR_RAISE:
+        pattern, count = repeated[0]
+        raise RepeatedQueriesError(
+            f'{request.method} {request.path} ran a query {count} times from {inspection.callers[pattern]}: {pattern}'
+        )
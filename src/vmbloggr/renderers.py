@@ -0,0 +1,11 @@
+from rest_framework.renderers import JSONRenderer
+
+from . import timing
+
+
+class TimedJSONRenderer(JSONRenderer):
+    ''' JSONRenderer reporting its time to the request's timing metrics, when it is sampled.'''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing.rendering():
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,94 @@
+''' Primary/replica routing of ORM traffic.
+
+Reads made while serving a request go to one of the DATABASE_REPLICAS;
+everything else uses the primary (`default`):
+
+* writes, and every read later in a request that has written
+* reads of users, sessions and the token blacklist: a replica lagging behind
+  would still accept a token just blacklisted, or a password just changed
+* reads inside a transaction on the primary
+* reads by a user who wrote less than DATABASE_STICKY_SECONDS ago, so they
+  see their own changes despite replication lag (the pin is kept in the
+  default cache, which settings.py requires to be shared between workers)
+* reads outside a request (management commands, background threads)
+
+ReplicaRoutingMiddleware marks where a request starts and ends.
+'''
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject
+
+STICKY_KEY = 'db:primary:user:%s'
+# apps whose rows decide who is authenticated
+PRIMARY_APP_LABELS = {'auth', 'users', 'sessions', 'token_blacklist'}
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        # a write happened during the request
+        self.wrote = False
+        # reads go to the primary for the rest of the request
+        self.pinned = False
+        self.checked_user_id = None
+
+
+def _user_id(request):
+    # never evaluate AuthenticationMiddleware's lazy user: loading it is itself a routed query
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject):
+        user = request.__dict__.get('_cached_user')
+    return getattr(user, 'pk', None)
+
+
+@contextmanager
+def routing(request):
+    ''' Route the reads made while serving request, remembering its user if it writes.'''
+    state = RoutingState(request)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+        user_id = _user_id(request)
+        if state.wrote and user_id is not None and settings.DATABASE_REPLICAS:
+            cache.set(STICKY_KEY % user_id, True, timeout=settings.DATABASE_STICKY_SECONDS)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not settings.DATABASE_REPLICAS or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_APP_LABELS:
+            return DEFAULT_DB_ALIAS
+        if not state.pinned:
+            user_id = _user_id(state.request)
+            # the user is only known once the request is authenticated
+            if user_id is not None and user_id != state.checked_user_id:
+                state.checked_user_id = user_id
+                state.pinned = bool(cache.get(STICKY_KEY % user_id))
+        if state.pinned:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,13 @@
+from . import timing
+
+
+class TimedSerializerMixin:
+    ''' Serializer reporting its to_representation() time to the request's timing metrics, when it is sampled.
+
+    Put it first in the bases of the serializers that build response bodies;
+    a list serializer times each of its items.
+    '''
+
+    def to_representation(self, instance):
+        with timing.serializing():
+            return super().to_representation(instance)
@@ -14,6 +14,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,13 +46,18 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt.token_blacklist',
     'drf_yasg',
+    'django_filters',
 
     'users',
     'blog',
 ]
 
 MIDDLEWARE = [
+    'vmbloggr.middleware.MetricsMiddleware',
+    'vmbloggr.middleware.RequestTimingMiddleware',
+    'vmbloggr.middleware.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'vmbloggr.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,6 +94,11 @@ WSGI_APPLICATION = 'vmbloggr.wsgi.application'
 DB_SQLITE = "sqlite"
 DB_POSTGRESQL = "postgresql"
 
+# seconds a Postgres connection is reused across requests ("None" keeps it open
+# indefinitely, 0 opens one per request); each gunicorn thread holds its own
+DB_CONN_MAX_AGE = os.environ.get("DB_CONN_MAX_AGE", "60")
+DB_CONN_MAX_AGE = None if DB_CONN_MAX_AGE == "None" else int(DB_CONN_MAX_AGE)
+
 DATABASES_ALL = {
     DB_SQLITE: {
         "ENGINE": "django.db.backends.sqlite3",
@@ -99,11 +111,65 @@ DATABASES_ALL = {
         "USER": os.environ.get("POSTGRES_USER", "postgres"),
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "postgres"),
         "PORT": int(os.environ.get("POSTGRES_PORT", "5432")),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        # check a reused connection before the request that picks it up
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_CONN_HEALTH_CHECKS", "True") == "True",
     },
 }
 
 DATABASES = {"default": DATABASES_ALL[os.environ.get("DJANGO_DB", DB_SQLITE)]}
 
+# read replicas of the default database: comma-separated hosts (Postgres) or
+# file paths (SQLite). Reads made while serving requests are spread over them,
+# see vmbloggr/routers.py
+DATABASE_REPLICAS = []
+for number, location in enumerate(filter(None, os.environ.get("DB_REPLICAS", "").split(",")), 1):
+    replica = dict(DATABASES["default"], TEST={"MIRROR": "default"})
+    replica["NAME" if replica["ENGINE"].endswith("sqlite3") else "HOST"] = location.strip()
+    DATABASES[f"replica{number}"] = replica
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["vmbloggr.routers.PrimaryReplicaRouter"]
+# seconds a user's reads stay on the primary after they write
+DATABASE_STICKY_SECONDS = int(os.environ.get("DB_STICKY_SECONDS", "5"))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# in-process memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in production
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "vmbloggr"),
+    },
+}
+
+# whether every worker process sees the same cache entries
+CACHE_SHARED = CACHES["default"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+
+# the read-your-writes pin of a user who wrote must reach whichever worker serves their next request
+if DATABASE_REPLICAS and not CACHE_SHARED:
+    raise ImproperlyConfigured(
+        "DB_REPLICAS needs a cache shared between workers; set CACHE_BACKEND, e.g. to a Redis cache."
+    )
+
+# read-through cache of serialized blog post responses; on by default with a
+# shared cache only, since invalidations must reach every worker
+BLOG_CACHE_ALIAS = "default"
+BLOG_CACHE_ENABLED = os.environ.get("BLOG_CACHE_ENABLED", str(CACHE_SHARED)) == "True"
+if BLOG_CACHE_ENABLED and not CACHE_SHARED:
+    raise ImproperlyConfigured(
+        "BLOG_CACHE_ENABLED needs a cache shared between workers; set CACHE_BACKEND, e.g. to a Redis cache."
+    )
+BLOG_CACHE_TIMEOUT = int(os.environ.get("BLOG_CACHE_TIMEOUT", "300"))
+
+# serve plain blog post reads from async views; only useful under an ASGI server
+BLOG_ASYNC_READS = os.environ.get("BLOG_ASYNC_READS", "False") == "True"
+
+# posts per request on the bulk create/update/delete endpoint
+BLOG_BULK_MAX_BATCH = int(os.environ.get("BLOG_BULK_MAX_BATCH", "1000"))
 
 
 # Password validation
@@ -149,17 +215,91 @@ STATIC_ROOT = BASE_DIR / "static2"
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# authenticate from the claims signed into the access token instead of
+# loading the user row on every request
+JWT_STATELESS_AUTH = os.environ.get("JWT_STATELESS_AUTH", "False") == "True"
+# seconds a full user row fetched for a stateless user stays cached in-process
+JWT_USER_CACHE_TTL = int(os.environ.get("JWT_USER_CACHE_TTL", "30"))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.StatelessJWTAuthentication'
+        if JWT_STATELESS_AUTH else
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'vmbloggr.pagination.ApproximateCountPagination',
     'PAGE_SIZE': 10,
+    # JSON rendering is timed for sampled requests, see vmbloggr/timing.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'vmbloggr.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# lists whose estimated size reaches this many rows report PostgreSQL's
+# estimate instead of running an exact COUNT(*)
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(os.environ.get("PAGINATION_COUNT_ESTIMATE_THRESHOLD", "100000"))
+# seconds list totals are cached for (0 disables the cache)
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.environ.get("PAGINATION_COUNT_CACHE_TIMEOUT", "0"))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'users.serializers.TokenBlacklistSerializer',
+    'TOKEN_USER_CLASS': 'users.authentication.ClaimsUser',
+}
+
+# seconds between in-process sweeps of expired tokens (0 disables them;
+# `python manage.py prune_tokens` can be scheduled instead)
+TOKEN_PRUNE_INTERVAL = int(os.environ.get("TOKEN_PRUNE_INTERVAL", "0"))
+TOKEN_PRUNE_BATCH_SIZE = int(os.environ.get("TOKEN_PRUNE_BATCH_SIZE", "1000"))
+
+# in-process Bloom filter answering "is this refresh token blacklisted?" without
+# a query for tokens it has never seen; tokens blacklisted by another process are
+# picked up within BLACKLIST_FILTER_SYNC_INTERVAL seconds
+BLACKLIST_FILTER_ENABLED = os.environ.get("BLACKLIST_FILTER_ENABLED", "False") == "True"
+BLACKLIST_FILTER_CAPACITY = int(os.environ.get("BLACKLIST_FILTER_CAPACITY", "1000000"))
+BLACKLIST_FILTER_ERROR_RATE = float(os.environ.get("BLACKLIST_FILTER_ERROR_RATE", "0.001"))
+BLACKLIST_FILTER_SYNC_INTERVAL = float(os.environ.get("BLACKLIST_FILTER_SYNC_INTERVAL", "1"))
+# seconds a blacklisting transaction may take to commit and still be picked up by the sync
+BLACKLIST_FILTER_SYNC_OVERLAP = float(os.environ.get("BLACKLIST_FILTER_SYNC_OVERLAP", "60"))
+
+# batch signup endpoint: rows per request, and processes hashing passwords
+# (1 hashes inside the request's own worker). A password takes ~0.3s to hash,
+# so a full batch has to finish well within gunicorn's 30s timeout; larger
+# imports go through `manage.py import_users`
+USER_IMPORT_MAX_BATCH = int(os.environ.get("USER_IMPORT_MAX_BATCH", "50"))
+USER_IMPORT_API_WORKERS = int(os.environ.get("USER_IMPORT_API_WORKERS", "1"))
+
+# share of requests timed by vmbloggr.middleware.RequestTimingMiddleware
+# (0 to 1; 0 disables it), reported in a Server-Timing header and a log line
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get("REQUEST_TIMING_SAMPLE_RATE", "0"))
+
+# Prometheus metrics at /metrics, see vmbloggr/metrics.py; the endpoint has no
+# authentication, so the shipped NGINX config keeps it off the public port
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "False") == "True"
+
+# development/staging aid, see vmbloggr/queries.py: log query patterns a request
+# repeats QUERY_INSPECTOR_REPEAT_THRESHOLD times or more (likely N+1), raising
+# for them with QUERY_INSPECTOR_RAISE, and queries slower than
+# QUERY_INSPECTOR_SLOW_MS milliseconds with their EXPLAIN
+QUERY_INSPECTOR_ENABLED = os.environ.get("QUERY_INSPECTOR_ENABLED", "False") == "True"
+QUERY_INSPECTOR_REPEAT_THRESHOLD = int(os.environ.get("QUERY_INSPECTOR_REPEAT_THRESHOLD", "5"))
+QUERY_INSPECTOR_RAISE = os.environ.get("QUERY_INSPECTOR_RAISE", "False") == "True"
+QUERY_INSPECTOR_SLOW_MS = float(os.environ.get("QUERY_INSPECTOR_SLOW_MS", "100"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "vmbloggr.timing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        "vmbloggr.queries": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
 }
 
 
@@ -0,0 +1,64 @@
+''' Test helpers shared by the apps' test suites.'''
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryPlanAssertionsMixin:
+    ''' Assertions on the database's query plan for the SQL behind a request.
+
+    PostgreSQL plans are read from EXPLAIN (FORMAT JSON) with sequential scans
+    discouraged, since the planner rightly prefers them on the tiny test
+    tables; SQLite plans from EXPLAIN QUERY PLAN.
+    '''
+
+    def ordered_query(self, path, params=None):
+        ''' The SQL of the last ordered query run to answer a GET of path.'''
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        queries = [query['sql'] for query in context.captured_queries if 'ORDER BY' in query['sql']]
+        self.assertTrue(queries, f'No ordered query was run for {path}')
+        return queries[-1]
+
+    def assertIndexScan(self, sql, index_name=None):
+        ''' Assert that sql is answered by walking an index, without a sort step.'''
+        if connection.vendor == 'postgresql':
+            indexes, sorted_ = self._postgres_plan(sql)
+        elif connection.vendor == 'sqlite':
+            indexes, sorted_ = self._sqlite_plan(sql)
+        else:
+            self.skipTest(f'Query plans are not inspected on {connection.vendor}')
+        self.assertFalse(sorted_, f'Query needs a sort step: {sql}')
+        self.assertTrue(indexes, f'Query uses no index: {sql}')
+        if index_name is not None:
+            self.assertIn(index_name, indexes)
+
+    def _postgres_plan(self, sql):
+        with connection.cursor() as cursor:
+            # SET LOCAL is undone when the test's transaction rolls back
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes, indexes, sorted_ = [plan[0]['Plan']], set(), False
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('Plans', []))
+            if 'Index Name' in node:
+                indexes.add(node['Index Name'])
+            sorted_ = sorted_ or node['Node Type'] in ('Sort', 'Incremental Sort')
+        return indexes, sorted_
+
+    def _sqlite_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        indexes = {
+            detail.split(' INDEX ', 1)[1].split(' ')[0]
+            for detail in details if ' INDEX ' in detail
+        }
+        sorted_ = any('TEMP B-TREE' in detail and 'ORDER BY' in detail for detail in details)
+        return indexes, sorted_
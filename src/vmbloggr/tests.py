@@ -0,0 +1,442 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from blog.models import BlogPost
+from users.models import User
+from vmbloggr import routers
+from vmbloggr.middleware import QueryInspectorMiddleware, ReplicaRoutingMiddleware, RequestTimingMiddleware
+from vmbloggr.queries import RepeatedQueriesError, normalize
+from vmbloggr.pagination import ApproximateCountPagination, estimate_count
+from vmbloggr.routers import PrimaryReplicaRouter
+
+
+@override_settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=1000, PAGINATION_COUNT_CACHE_TIMEOUT=0)
+class ApproximateCountPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i in range(3):
+            User.objects.create(username=f'user{i}', email=f'user{i}@gmail.com', phone_number=f'+234{i}')
+        self.client.force_authenticate(user=User.objects.get(username='user0'))
+
+    def get(self, **params):
+        response = self.client.get('/api/users/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_small_results_are_counted_exactly(self):
+        data = self.get()
+        self.assertEqual(data['count'], 3)
+        self.assertFalse(data['count_is_approximate'])
+
+    def test_estimate_below_threshold_is_not_used(self):
+        with mock.patch('vmbloggr.pagination.estimate_count', return_value=999):
+            data = self.get()
+        self.assertEqual(data['count'], 3)
+        self.assertFalse(data['count_is_approximate'])
+
+    def test_estimate_above_threshold_replaces_count(self):
+        with mock.patch('vmbloggr.pagination.estimate_count', return_value=250000):
+            with self.assertNumQueries(1):
+                data = self.get()
+        self.assertEqual(data['count'], 250000)
+        self.assertTrue(data['count_is_approximate'])
+        self.assertEqual(len(data['results']), 3)
+
+    @override_settings(PAGINATION_COUNT_ESTIMATE_THRESHOLD=1)
+    def test_pages_past_an_undercounting_estimate_are_served(self):
+        with mock.patch('vmbloggr.pagination.estimate_count', return_value=1), \
+                mock.patch.object(ApproximateCountPagination, 'page_size', 2):
+            data = self.get()
+            self.assertEqual(len(data['results']), 2)
+            data = self.get(page=2)
+            self.assertEqual([user['username'] for user in data['results']], ['user2'])
+
+    @override_settings(PAGINATION_COUNT_CACHE_TIMEOUT=60)
+    def test_cached_count(self):
+        self.assertFalse(self.get()['count_is_approximate'])
+        User.objects.create(username='user3', email='user3@gmail.com', phone_number='+2343')
+
+        data = self.get()
+        self.assertEqual(data['count'], 3)
+        self.assertTrue(data['count_is_approximate'])
+        self.assertEqual(len(data['results']), 4)
+
+    def test_estimate_count(self):
+        estimate = estimate_count(User.objects.filter(is_active=True))
+        if connection.vendor == 'postgresql':
+            self.assertIsInstance(estimate, int)
+        else:
+            self.assertIsNone(estimate)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_STICKY_SECONDS=60)
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def request(self, user_id=None):
+        request = self.factory.get('/')
+        if user_id is not None:
+            # as set by DRF once the request is authenticated
+            request.user = mock.Mock(pk=user_id)
+        return request
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(BlogPost), 'default')
+
+    def test_reads_in_request_use_replica(self):
+        with routers.routing(self.request()):
+            self.assertEqual(self.router.db_for_read(BlogPost), 'replica')
+
+    def test_auth_reads_use_primary(self):
+        with routers.routing(self.request()):
+            for model in (User, Group, Session, OutstandingToken, BlacklistedToken):
+                self.assertEqual(self.router.db_for_read(model), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        with routers.routing(self.request()):
+            self.assertEqual(self.router.db_for_read(BlogPost), 'default')
+
+    def test_read_after_write_uses_primary(self):
+        with routers.routing(self.request()):
+            self.assertEqual(self.router.db_for_write(BlogPost), 'default')
+            self.assertEqual(self.router.db_for_read(BlogPost), 'default')
+        with routers.routing(self.request()):
+            self.assertEqual(self.router.db_for_read(BlogPost), 'replica')
+
+    def test_writer_sticks_to_primary(self):
+        with routers.routing(self.request(user_id=1)):
+            self.router.db_for_write(BlogPost)
+        with routers.routing(self.request(user_id=1)):
+            self.assertEqual(self.router.db_for_read(BlogPost), 'default')
+        with routers.routing(self.request(user_id=2)):
+            self.assertEqual(self.router.db_for_read(BlogPost), 'replica')
+
+    def test_sticky_window_expires(self):
+        with routers.routing(self.request(user_id=1)):
+            self.router.db_for_write(BlogPost)
+        cache.delete(routers.STICKY_KEY % 1)
+        with routers.routing(self.request(user_id=1)):
+            self.assertEqual(self.router.db_for_read(BlogPost), 'replica')
+
+    async def test_async_middleware(self):
+        async def view(request):
+            return self.router.db_for_read(BlogPost)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(await middleware(self.request()), 'replica')
+
+    def test_lazy_user_is_not_evaluated(self):
+        request = self.request()
+        request.user = SimpleLazyObject(mock.Mock(side_effect=AssertionError('user loaded')))
+        with routers.routing(request):
+            self.assertEqual(self.router.db_for_read(BlogPost), 'replica')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_STICKY_SECONDS=60, BLOG_CACHE_ENABLED=False)
+class ReplicaRoutingIntegrationTest(TransactionTestCase):
+    ''' Two SQLite databases stand in for a primary and a replica that never catches up.'''
+
+    @classmethod
+    def setUpClass(cls):
+        # the replica alias only exists for this class, so the test runner must not see it
+        default = connections.settings['default']
+        connections.settings['replica'] = {**default, 'NAME': 'replica', 'TEST': {**default['TEST'], 'NAME': None}}
+        cls.replica_name = connections['replica'].creation.create_test_db(verbosity=0, serialize=False)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].creation.destroy_test_db(cls.replica_name, verbosity=0)
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@gmail.com', phone_number='+2341')
+        self.reader = User.objects.create(username='reader', email='reader@gmail.com', phone_number='+2342')
+        self.client = APIClient()
+
+    def test_reads_follow_the_writer(self):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(reverse('blog-post-create'), {'title': 'New', 'subtitle': 'New'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post_id = BlogPost.objects.using('default').get(title='New').pk
+        self.assertFalse(BlogPost.objects.using('replica').exists())
+
+        # the author reads their own write from the primary
+        response = self.client.get(reverse('blog-post-detail', args=[post_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # other users read the replica, which has not received the post
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(reverse('blog-post-detail', args=[post_id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        BlogPost.objects.using('replica').create(pk=post_id, title='New', subtitle='New')
+        response = self.client.get(reverse('blog-post-detail', args=[post_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_auth_reads_use_the_primary(self):
+        # the replica has not received the user, nor will it see the blacklisting
+        User.objects.create_user(username='newuser', password='password1', email='new@gmail.com')
+        response = self.client.post(reverse('login'), {'username': 'newuser', 'password': 'password1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        refresh = response.data['tokens']['refresh']
+        response = self.client.post(reverse('token_blacklist'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1, BLOG_CACHE_ENABLED=False)
+class RequestTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create(username='author', email='author@gmail.com', phone_number='+2341')
+        for i in range(3):
+            BlogPost.objects.create(author=self.author, title=f'Title {i}', subtitle=f'Subtitle {i}')
+        self.client.force_authenticate(user=self.author)
+
+    def test_sampled_request_is_timed(self):
+        with self.assertLogs('vmbloggr.timing', 'INFO') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog-posts-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        fields = json.loads(logs.records[0].getMessage())
+        self.assertEqual(fields['path'], '/api/blogs/')
+        self.assertEqual(fields['status'], 200)
+        self.assertEqual(fields['db_queries'], len(queries))
+        self.assertEqual(fields['response_bytes'], len(response.content))
+        self.assertGreater(fields['serialize_ms'], 0)
+        self.assertGreater(fields['render_ms'], 0)
+        self.assertGreaterEqual(fields['duration_ms'], fields['db_ms'])
+
+        entries = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(entries, ['db', 'serialize', 'render', 'total'])
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_timed(self):
+        with self.assertNoLogs('vmbloggr.timing'):
+            response = self.client.get(reverse('blog-posts-list'))
+        self.assertNotIn('Server-Timing', response)
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestTimingMiddleware(lambda request: HttpResponse())
+
+    def test_connections_untouched_until_enabled(self):
+        script = (
+            "import django; django.setup(); "
+            "from django.db import connection; from django.db.backends.signals import connection_created; "
+            "from vmbloggr import middleware, timing; "
+            "connection_created.send(type(connection), connection=connection); "
+            "print(timing.record_query in connection.execute_wrappers); "
+            "timing.enable(); connection_created.send(type(connection), connection=connection); "
+            "print(timing.record_query in connection.execute_wrappers)"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'vmbloggr.settings'},
+        )
+        self.assertEqual(result.stdout.split(), ['False', 'True'])
+
+    async def test_async_request_is_timed(self):
+        async def view(request):
+            return HttpResponse(str(await User.objects.acount()))
+
+        middleware = RequestTimingMiddleware(view)
+        with self.assertLogs('vmbloggr.timing', 'INFO') as logs:
+            response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(json.loads(logs.records[0].getMessage())['db_queries'], 1)
+        self.assertIn('Server-Timing', response)
+
+
+@override_settings(BLOG_CACHE_ENABLED=True, METRICS_ENABLED=True)
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.author = User.objects.create(username='author', email='author@gmail.com', phone_number='+2341')
+        self.post = BlogPost.objects.create(author=self.author, title='Title', subtitle='Subtitle')
+        self.client.force_authenticate(user=self.author)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_recorded_by_route(self):
+        labels = {'route': 'api/blogs/<int:pk>/', 'method': 'GET', 'status': '200'}
+        requests = self.sample('vmbloggr_http_requests_total', **labels)
+        hits = self.sample('vmbloggr_blog_cache_lookups_total', result='hit')
+        latencies = self.sample('vmbloggr_http_request_duration_seconds_count', route=labels['route'], method='GET')
+
+        for _ in range(2):
+            self.client.get(reverse('blog-post-detail', args=[self.post.id]))
+        self.client.get('/api/missing/')
+
+        self.assertEqual(self.sample('vmbloggr_http_requests_total', **labels), requests + 2)
+        self.assertEqual(self.sample('vmbloggr_blog_cache_lookups_total', result='hit'), hits + 1)
+        self.assertEqual(
+            self.sample('vmbloggr_http_request_duration_seconds_count', route=labels['route'], method='GET'),
+            latencies + 2,
+        )
+        self.assertGreater(self.sample('vmbloggr_http_requests_total', route='unmatched', method='GET', status='404'), 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('blog-posts-list'))
+        response = APIClient().get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('vmbloggr_http_requests_total{method="GET",route="api/blogs/",status="200"}', body)
+        self.assertIn('vmbloggr_http_request_db_queries_bucket', body)
+        self.assertIn('vmbloggr_worker_requests_in_progress', body)
+
+    def test_metrics_endpoint_off_by_default(self):
+        with self.settings(METRICS_ENABLED=False):
+            response = APIClient().get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_samples_of_worker_processes_are_added_up(self):
+        script = (
+            "from vmbloggr import metrics; "
+            "metrics.REQUESTS.labels('api/blogs/', 'GET', 200).inc(); metrics.IN_PROGRESS.set(1)"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True,
+                    env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory},
+                )
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=directory)
+            labels = {'route': 'api/blogs/', 'method': 'GET', 'status': '200'}
+            self.assertEqual(registry.get_sample_value('vmbloggr_http_requests_total', labels), 2)
+            gauges = [sample for metric in registry.collect() for sample in metric.samples
+                      if sample.name == 'vmbloggr_worker_requests_in_progress']
+            # one sample per worker
+            self.assertEqual(len(gauges), 2)
+
+
+@override_settings(
+    QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_REPEAT_THRESHOLD=3, QUERY_INSPECTOR_RAISE=False,
+    QUERY_INSPECTOR_SLOW_MS=10000,
+)
+class QueryInspectorTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='author@gmail.com', phone_number='+2341')
+        for i in range(3):
+            BlogPost.objects.create(author=self.author, title=f'Title {i}', subtitle=f'Subtitle {i}')
+        self.request = RequestFactory().get('/api/blogs/')
+
+    def list_authors(self, request):
+        # one author query per post
+        return HttpResponse(', '.join(post.author.username for post in BlogPost.objects.all()))
+
+    def list_authors_joined(self, request):
+        return HttpResponse(', '.join(post.author.username for post in BlogPost.objects.select_related('author')))
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize('SELECT * FROM "t" WHERE "id" IN (%s, %s,  %s) AND "name" = \'x\' LIMIT 21'),
+            'SELECT * FROM "t" WHERE "id" IN (?, ...) AND "name" = ? LIMIT ?',
+        )
+
+    def test_repeated_queries_are_logged_with_their_caller(self):
+        with self.assertLogs('vmbloggr.queries', 'WARNING') as logs:
+            QueryInspectorMiddleware(self.list_authors)(self.request)
+        self.assertEqual(len(logs.records), 1)
+        message = logs.records[0].getMessage()
+        self.assertIn('3 runs of a query from vmbloggr/tests.py', message)
+        self.assertIn('in <genexpr>', message)
+        self.assertIn('"users_user"', message)
+
+    def test_joined_queries_are_not_flagged(self):
+        with self.assertNoLogs('vmbloggr.queries'):
+            QueryInspectorMiddleware(self.list_authors_joined)(self.request)
+
+    @override_settings(QUERY_INSPECTOR_RAISE=True)
+    def test_repeated_queries_raise(self):
+        with self.assertLogs('vmbloggr.queries', 'WARNING'), self.assertRaises(RepeatedQueriesError):
+            QueryInspectorMiddleware(self.list_authors)(self.request)
+
+    @override_settings(QUERY_INSPECTOR_SLOW_MS=0, QUERY_INSPECTOR_REPEAT_THRESHOLD=100)
+    def test_slow_queries_are_logged_with_their_plan(self):
+        with self.assertLogs('vmbloggr.queries', 'WARNING') as logs:
+            QueryInspectorMiddleware(self.list_authors_joined)(self.request)
+        message = logs.records[0].getMessage()
+        self.assertIn('Slow query', message)
+        self.assertIn('"blog_blogpost"', message)
+        # the plan follows the statement
+        self.assertGreater(len(message.split('\n')), 2)
+
+    @override_settings(QUERY_INSPECTOR_SLOW_MS=0, QUERY_INSPECTOR_REPEAT_THRESHOLD=100)
+    def test_common_table_expressions_are_explained(self):
+        def view(request):
+            with connection.cursor() as cursor:
+                cursor.execute('WITH posts AS (SELECT id FROM blog_blogpost) SELECT COUNT(*) FROM posts')
+            return HttpResponse()
+
+        with self.assertLogs('vmbloggr.queries', 'WARNING') as logs:
+            QueryInspectorMiddleware(view)(self.request)
+        self.assertIn('WITH posts', logs.records[0].getMessage())
+        self.assertNotIn('EXPLAIN failed', logs.records[0].getMessage())
+
+    @override_settings(QUERY_INSPECTOR_SLOW_MS=0, QUERY_INSPECTOR_REPEAT_THRESHOLD=100)
+    def test_failed_explain_leaves_the_request_transaction_usable(self):
+        with mock.patch.object(connection.ops, 'explain_query_prefix', return_value='NOT EXPLAIN'), \
+                self.assertLogs('vmbloggr.queries', 'WARNING') as logs:
+            response = QueryInspectorMiddleware(self.list_authors_joined)(self.request)
+        self.assertEqual(response.content.decode(), 'author, author, author')
+        self.assertIn('EXPLAIN failed', logs.records[0].getMessage())
+        # the savepoint was rolled back, the surrounding transaction was not
+        self.assertEqual(BlogPost.objects.count(), 3)
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryInspectorMiddleware(self.list_authors)
+
+    def test_connections_untouched_until_enabled(self):
+        script = (
+            "import django; django.setup(); "
+            "from django.db import connection; from django.db.backends.signals import connection_created; "
+            "from vmbloggr import middleware, queries; "
+            "connection_created.send(type(connection), connection=connection); "
+            "print(queries.inspect_query in connection.execute_wrappers); "
+            "queries.enable(); connection_created.send(type(connection), connection=connection); "
+            "print(queries.inspect_query in connection.execute_wrappers)"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'vmbloggr.settings'},
+        )
+        self.assertEqual(result.stdout.split(), ['False', 'True'])
@@ -0,0 +1,111 @@
+''' Where a request's time goes: SQL, serialization, rendering, and the rest.
+
+RequestTimingMiddleware starts a RequestMetrics for a sample of requests
+(REQUEST_TIMING_SAMPLE_RATE) and makes it current for the request, which
+turns on the hooks that otherwise only check for it:
+
+* an execute wrapper on the database connections, counting and timing queries
+* vmbloggr.serializers.TimedSerializerMixin, timing serializers' to_representation()
+* vmbloggr.renderers.TimedJSONRenderer, timing the rendering of the response body
+
+The execute wrapper is only installed once enable() is called, i.e. when
+sampling (or vmbloggr.metrics) is on. The metrics go out as a Server-Timing
+header and a JSON log line on the `vmbloggr.timing` logger.
+'''
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.serializing = False
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+@contextmanager
+def measure():
+    ''' Collect the metrics of the code run inside, across threads it hands work to.
+
+    Nested inside another measure(), the outer metrics are shared.
+    '''
+    if _metrics.get() is not None:
+        yield _metrics.get()
+        return
+    metrics = RequestMetrics()
+    token = _metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _metrics.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(connection, **kwargs):
+    # first in the list, so execute_wrapper() blocks entered earlier still pop their own wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_query_recorders():
+    ''' Add record_query to this thread's open connections; after enable(), new ones get it when they connect.'''
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+def enable():
+    ''' Give every connection opened from now on the query recorder.'''
+    connection_created.connect(install_query_recorder, dispatch_uid='vmbloggr.timing.install_query_recorder')
+
+
+@contextmanager
+def serializing():
+    ''' Add the time spent inside to the current metrics, if any; nested serializers count once.'''
+    metrics = _metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        metrics.serialize_time += time.perf_counter() - start
+
+
+@contextmanager
+def rendering():
+    ''' Add the time spent inside to the current metrics, if any.'''
+    metrics = _metrics.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.render_time += time.perf_counter() - start
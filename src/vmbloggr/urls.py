@@ -22,6 +22,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from users.views import index_view
+from vmbloggr.metrics import metrics_view
 
 
 schema_view = get_schema_view(
@@ -46,5 +47,8 @@ urlpatterns = [
     re_path(r'^swagger\.(?P<format>(json|yaml))$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('api/docs/swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('api/docs/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+
+    # monitoring; 404 unless METRICS_ENABLED
+    path("metrics", metrics_view, name="metrics"),
 ]
 
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vmbloggr.settings')
 
 application = get_wsgi_application()
+
+# periodic pruning of expired JWTs, when TOKEN_PRUNE_INTERVAL is set, and the
+# blacklist filter, when BLACKLIST_FILTER_ENABLED is set
+from users.blacklist import warm_blacklist_filter  # noqa: E402
+from users.maintenance import start_token_pruner  # noqa: E402
+
+start_token_pruner()
+warm_blacklist_filter()